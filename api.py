@@ -0,0 +1,233 @@
+"""Lightweight JSON recommendation service for clients that don't need the Streamlit UI.
+
+    python api.py --port 8502
+
+    POST /recommend  {"weights": {"cost": 0.8, ...}, "type": "Dog", "k": 5}
+    GET  /health
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+from main import calculate_pet_scores, load_pet_data
+from render_cache import LRUBytesCache
+from results_cache import RESULTS_CACHE
+from scoring import ATTRIBUTES
+
+logger = logging.getLogger("pet_advisor.api")
+
+DEFAULT_K = 3
+MAX_K = 100
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+
+# Encoded responses for repeated requests, keyed by (catalog version, weights, type, k)
+RESPONSE_CACHE = LRUBytesCache(int(os.environ.get("PET_ADVISOR_API_CACHE_BYTES", 8 * 1024 * 1024)))
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Validate a /recommend body and return (weights tuple, pet type, k)
+def parse_recommend_request(body):
+    try:
+        payload = json.loads(body or b"{}")
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise RequestError(400, "Body must be valid JSON") from None
+    if not isinstance(payload, dict):
+        raise RequestError(400, "Body must be a JSON object")
+
+    weights = payload.get("weights", {})
+    if not isinstance(weights, dict):
+        raise RequestError(400, "'weights' must be an object")
+    unknown = sorted(set(weights) - set(ATTRIBUTES))
+    if unknown:
+        raise RequestError(400, f"Unknown criteria: {', '.join(unknown)}")
+
+    weight_values = []
+    for criterion in ATTRIBUTES:
+        value = weights.get(criterion, 0.0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0.0 <= value <= 1.0:
+            raise RequestError(400, f"Weight '{criterion}' must be a number between 0 and 1")
+        weight_values.append(float(value))
+
+    pet_type = payload.get("type")
+    if pet_type in ("All Types", ""):
+        pet_type = None
+    if pet_type is not None and not isinstance(pet_type, str):
+        raise RequestError(400, "'type' must be a string")
+
+    k = payload.get("k", DEFAULT_K)
+    if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= MAX_K:
+        raise RequestError(400, f"'k' must be an integer between 1 and {MAX_K}")
+
+    return tuple(weight_values), pet_type, k
+
+
+# Rank pets with the same catalog and scoring function as the Streamlit app
+def recommend(catalog, weights, pet_type, k):
+    user_weights = dict(zip(ATTRIBUTES, weights))
+    # Shared with the Streamlit app's rankings (same filter key: type, no constraints)
+    scored_pets, _ = RESULTS_CACHE.scored(
+        catalog, catalog.engine.weight_vector(user_weights), (pet_type, ()), "WSM", k,
+        lambda: calculate_pet_scores(catalog, user_weights, k=k, rows=catalog.index.candidates(pet_type))
+    )
+
+    results = [
+        {
+            "rank": rank,
+            "id": pet["id"],
+            "name": pet["name"],
+            "type": pet["type"],
+            "score": round(pet["score"], 2),
+            "image": pet["image"],
+        }
+        for rank, pet in enumerate(scored_pets, start=1)
+    ]
+    return json.dumps({"catalog_version": catalog.version, "results": results}).encode()
+
+
+class RecommendationServer:
+    def __init__(self):
+        # Identical requests that arrive while one is being scored share its result
+        self.in_flight = {}
+
+    async def recommend(self, body):
+        weights, pet_type, k = parse_recommend_request(body)
+        catalog = load_pet_data()
+        key = (catalog.version, weights, pet_type, k)
+
+        cached = RESPONSE_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+        task = self.in_flight.get(key)
+        if task is None:
+            # Score off the event loop so large catalogs don't stall other connections
+            task = asyncio.ensure_future(asyncio.to_thread(recommend, catalog, weights, pet_type, k))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+
+        response = await asyncio.shield(task)
+        RESPONSE_CACHE.put(key, response)
+        return response
+
+    def health(self):
+        catalog = load_pet_data()
+        return json.dumps({
+            "status": "ok",
+            "catalog_version": catalog.version,
+            "pets": len(catalog),
+            "cache": RESPONSE_CACHE.stats(),
+            "results_cache": RESULTS_CACHE.stats(),
+        }).encode()
+
+    async def route(self, method, path, body):
+        path = path.split("?", 1)[0]
+        if path == "/recommend":
+            if method != "POST":
+                raise RequestError(405, "Use POST /recommend")
+            return await self.recommend(body)
+        if path == "/health":
+            if method != "GET":
+                raise RequestError(405, "Use GET /health")
+            return self.health()
+        raise RequestError(404, f"No route for {path}")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send(writer, 413, {"error": "Request headers too large"}, keep_alive=False)
+                    break
+
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, version = request_line.split(" ", 2)
+                except ValueError:
+                    await self.send(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+                    break
+
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY_BYTES:
+                    await self.send(writer, 413, {"error": "Invalid or oversized body"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    response = await self.route(method, path, body)
+                    await self.send(writer, 200, response, keep_alive)
+                except RequestError as e:
+                    await self.send(writer, e.status, {"error": str(e)}, keep_alive)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logger.exception("Unhandled error while serving a request")
+            await self.send(writer, 500, {"error": "Internal server error"}, keep_alive=False)
+        finally:
+            writer.close()
+
+    async def send(self, writer, status, body, keep_alive):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, 'Internal Server Error')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def start(self, host, port):
+        return await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+
+
+async def serve(host, port):
+    server = await RecommendationServer().start(host, port)
+    addresses = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+    logger.info("Serving recommendations on %s", addresses)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve pet recommendations as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
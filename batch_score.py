@@ -0,0 +1,245 @@
+"""Score large files of weight profiles against the pet catalog offline.
+
+    python batch_score.py profiles.csv -o recommendations.csv --top-k 5 --workers 8
+
+Input is CSV or JSON Lines with one column per criterion (space_required,
+activity_level, ...) and an optional profile_id. Output is CSV (one row per
+recommendation) or JSON Lines (one object per profile), chosen by extension.
+"""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from catalog import DEFAULT_CATALOG_PATH, get_catalog
+from scoring import ATTRIBUTES, top_k_batch
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+# Upper bound on pets x profiles scored at once, so memory stays flat for any catalog size
+MAX_SCORE_CELLS = 1 << 22
+
+CSV_OUTPUT_HEADER = ["profile_id", "rank", "pet_id", "pet_name", "score"]
+
+
+def file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"{path}: unsupported format '{extension}' (use .csv or .jsonl)")
+
+
+# Read the input as raw line chunks; parsing happens in the workers.
+# Returns the CSV header (None for JSON Lines) and a generator of
+# (first row number, lines) chunks.
+def read_line_chunks(f, fmt, chunk_size):
+    header = None
+    if fmt == "csv":
+        header = next(csv.reader([f.readline()]), [])
+        missing = [criterion for criterion in ATTRIBUTES if criterion not in header]
+        if missing:
+            raise ValueError(f"missing weight columns: {', '.join(missing)}")
+
+    def chunks():
+        first_row = 1
+        lines = (line for line in f if line.strip())
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                return
+            yield first_row, chunk
+            first_row += len(chunk)
+
+    return header, chunks()
+
+
+# Turn raw lines into profile ids and a (c, 9) weight matrix
+def parse_profiles(lines, first_row, fmt, header):
+    records = csv.DictReader(lines, fieldnames=header) if fmt == "csv" else lines
+
+    profile_ids = []
+    weights = []
+    for row, record in enumerate(records, start=first_row):
+        if fmt != "csv":
+            try:
+                record = json.loads(record)
+            except ValueError as e:
+                raise ValueError(f"profile {row}: invalid JSON ({e})") from None
+        try:
+            weights.append([float(record[criterion]) for criterion in ATTRIBUTES])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"profile {row}: invalid or missing weight ({e})") from None
+        profile_ids.append(record.get("profile_id", row))
+
+    return profile_ids, np.array(weights, dtype=np.float64).reshape(-1, len(ATTRIBUTES))
+
+
+# Top-k catalog rows and scores for a (c, 9) weight matrix, shape (k, c) each
+def score_profiles(catalog, weights, k, pet_type=None):
+    rows = None if pet_type is None else catalog.index.candidates(pet_type)
+    candidate_count = len(catalog) if rows is None else len(rows)
+
+    top_rows = []
+    top_scores = []
+    step = max(1, MAX_SCORE_CELLS // max(candidate_count, 1))
+    for start in range(0, len(weights), step):
+        scores = catalog.engine.score(weights[start:start + step], rows=rows)
+        best = top_k_batch(scores, k)
+        top_scores.append(np.take_along_axis(scores, best, axis=0))
+        top_rows.append(best if rows is None else rows[best])
+
+    if not top_rows:
+        return np.empty((0, 0), dtype=np.intp), np.empty((0, 0))
+    return np.hstack(top_rows), np.hstack(top_scores)
+
+
+# Render the results for one chunk as output text
+def format_results(catalog, fmt, profile_ids, top_rows, top_scores):
+    pets = catalog.pets
+    out = io.StringIO()
+    writer = csv.writer(out) if fmt == "csv" else None
+
+    for column, profile_id in enumerate(profile_ids):
+        rows = top_rows[:, column].tolist()
+        scores = top_scores[:, column].tolist()
+        if writer is not None:
+            writer.writerows(
+                [profile_id, rank, pets[row]["id"], pets[row]["name"], f"{score:.4f}"]
+                for rank, (row, score) in enumerate(zip(rows, scores), start=1)
+            )
+        else:
+            recommendations = [
+                {"id": pets[row]["id"], "name": pets[row]["name"], "score": round(score, 4)}
+                for row, score in zip(rows, scores)
+            ]
+            out.write(json.dumps({"profile_id": profile_id, "recommendations": recommendations}) + "\n")
+
+    return out.getvalue()
+
+
+# Per-process job settings; pool workers open the shared memory-mapped catalog once
+_job = None
+
+
+def _init_job(catalog_path, input_fmt, header, output_fmt, k, pet_type):
+    global _job
+    _job = {
+        "catalog": get_catalog(catalog_path),
+        "input_fmt": input_fmt,
+        "header": header,
+        "output_fmt": output_fmt,
+        "k": k,
+        "pet_type": pet_type,
+    }
+
+
+# Parse, score and format one chunk; returns (profile count, output text)
+def process_chunk(first_row, lines):
+    catalog = _job["catalog"]
+    profile_ids, weights = parse_profiles(lines, first_row, _job["input_fmt"], _job["header"])
+    top_rows, top_scores = score_profiles(catalog, weights, _job["k"], _job["pet_type"])
+    return len(profile_ids), format_results(catalog, _job["output_fmt"], profile_ids, top_rows, top_scores)
+
+
+# Run chunks on a process pool with at most two chunks per worker in flight,
+# so memory stays bounded however large the input is; results come back in order
+def _process_in_pool(chunks, workers, initargs):
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_job, initargs=initargs
+    ) as pool:
+        pending = collections.deque()
+        for first_row, lines in chunks:
+            pending.append(pool.submit(process_chunk, first_row, lines))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def report(rows, started, final=False):
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    label = "done" if final else "progress"
+    print(f"{label}: {rows:,} profiles in {elapsed:.1f}s ({rate:,.0f} rows/sec)", file=sys.stderr)
+
+
+def run(args):
+    input_fmt = file_format(args.input)
+    output_fmt = "csv" if args.output == "-" else file_format(args.output)
+
+    started = time.perf_counter()
+    last_report = started
+    processed = 0
+
+    with open(args.input, newline="", encoding="utf-8") as source:
+        header, chunks = read_line_chunks(source, input_fmt, args.chunk_size)
+        initargs = (args.catalog, input_fmt, header, output_fmt, args.top_k, args.type)
+
+        stream = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+        try:
+            if output_fmt == "csv":
+                csv.writer(stream).writerow(CSV_OUTPUT_HEADER)
+
+            if args.workers <= 1:
+                _init_job(*initargs)
+                results = (process_chunk(first_row, lines) for first_row, lines in chunks)
+            else:
+                results = _process_in_pool(chunks, args.workers, initargs)
+
+            for count, text in results:
+                stream.write(text)
+                processed += count
+
+                if time.perf_counter() - last_report >= args.report_every:
+                    report(processed, started)
+                    last_report = time.perf_counter()
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+    report(processed, started, final=True)
+    return processed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score weight profiles against the pet catalog.")
+    parser.add_argument("input", help="CSV or JSON Lines file of weight profiles")
+    parser.add_argument("-o", "--output", default="-", help="CSV or JSON Lines output file (default: CSV on stdout)")
+    parser.add_argument("-c", "--catalog", default=DEFAULT_CATALOG_PATH, help="pet catalog file")
+    parser.add_argument("-k", "--top-k", type=int, default=3, help="recommendations per profile (default: 3)")
+    parser.add_argument("--type", help="only recommend pets of this type, e.g. Dog")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="profiles per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (1 = no pool)")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+
+    args = parser.parse_args(argv)
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        run(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
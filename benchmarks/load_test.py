@@ -0,0 +1,189 @@
+"""Load-test the app with many concurrent simulated sessions.
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --sizes 1000,100000 --sessions 16 --actions 30 -o load.json
+
+For each catalog size a synthetic catalog is written and the app is started
+with `streamlit run`, then many sessions connect to it over its websocket at
+once, like browsers would (see benchmarks.partial_rerun). Every session loads
+the page, asks for matches, then keeps moving a slider, changing the pet type
+or pressing the button again, each followed by a rerun. Reported per size:
+p50/p95/p99 rerun latency (overall and per action, with each session's first
+load and first search apart), reruns per second across all sessions and the
+server's peak RSS. Everything runs offline on one machine; the sessions share
+its CPUs with the server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.asyncio.client import connect
+
+from benchmarks.partial_rerun import FIND_BUTTON, Session, free_port, start_server
+from benchmarks.synthetic import write_catalog
+
+ACTIONS = ("slider", "type", "button")
+COLD_ACTIONS = ("load", "first_search")
+PERCENTILES = (50, 95, 99)
+
+
+# A session that also remembers the preference sliders (constraint and
+# ideal-profile sliders reuse their labels, but hold ranges or are keyed
+# ideal_<criterion>), selectbox options and exceptions the app shows
+class LoadSession(Session):
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.sliders = {}
+        self.options = {}
+        self.errors = []
+
+    def _track(self, delta):
+        if delta.HasField("new_element"):
+            element = delta.new_element
+            kind = element.WhichOneof("type")
+            if kind == "slider" and len(element.slider.default) == 1 and "-ideal_" not in element.slider.id:
+                self.sliders[element.slider.label] = element.slider.id
+            elif kind == "selectbox":
+                self.options[element.selectbox.label] = list(element.selectbox.options)
+            elif kind == "exception":
+                self.errors.append(element.exception.message)
+        super()._track(delta)
+
+    def set_slider(self, label, value):
+        state = WidgetState(id=self.sliders[label])
+        state.double_array_value.data[:] = [value]
+        self.states[state.id] = state
+
+
+# One simulated user: returns [(action, seconds, error or None), ...]
+async def run_session(port, session_id, actions, seed):
+    rng = random.Random(seed * 1_000_003 + session_id)
+    connection = await connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None)
+    session = LoadSession(connection)
+    timings = []
+
+    async def rerun(action, fragment_id=None, triggers=()):
+        session.errors.clear()
+        result = await session.rerun(fragment_id, triggers)
+        timings.append((action, result["seconds"], session.errors[0] if session.errors else None))
+
+    await rerun("load")
+    await rerun("first_search", *session.trigger(FIND_BUTTON))
+
+    for _ in range(actions):
+        action = rng.choice(ACTIONS)
+        if action == "slider":
+            # Preference sliders are in the sidebar form, so they are applied with the button
+            session.set_slider(rng.choice(list(session.sliders)), round(rng.randint(0, 10) / 10, 1))
+        elif action == "type":
+            session.set_value("Pet Type", "string_value", rng.choice(session.options["Pet Type"]))
+        await rerun(action, *session.trigger(FIND_BUTTON))
+
+    await connection.close()
+    return timings
+
+
+async def run_sessions(port, sessions, actions, seed):
+    return await asyncio.gather(*(run_session(port, session_id, actions, seed) for session_id in range(sessions)))
+
+
+# Peak resident set size of a process in MB (Linux), or None
+def peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def summarize(latencies):
+    values = np.asarray(latencies) * 1000
+    summary = {f"p{p}_ms": float(np.percentile(values, p)) for p in PERCENTILES}
+    summary["count"] = len(values)
+    return summary
+
+
+def run_size(size, sessions, actions, seed):
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog_path = write_catalog(os.path.join(tmp, "pets.jsonl"), size, seed) if size else None
+        # A private cache directory (attribute maps, shared results) so every size starts cold,
+        # and no thumbnail warming: it would fetch every pet's image over the network
+        env = {"PET_ADVISOR_CACHE_DIR": tmp, "PET_CATALOG_POLL_SECONDS": "0", "PET_ADVISOR_THUMBNAIL_WORKERS": "0"}
+        port = free_port()
+        server = start_server(port, catalog_path, env)
+        try:
+            started = time.perf_counter()
+            results = asyncio.run(run_sessions(port, sessions, actions, seed))
+            elapsed = time.perf_counter() - started
+            peak_rss = peak_rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+
+    timings = [timing for session in results for timing in session]
+    # Each session's first load and search also build the catalog and warm the caches; keep them apart
+    measured = [(action, seconds) for action, seconds, _ in timings if action not in COLD_ACTIONS]
+    return {
+        "size": size,
+        "sessions": sessions,
+        "reruns": len(timings),
+        "errors": sorted({error for _, _, error in timings if error}),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(timings) / elapsed,
+        "peak_rss_mb": peak_rss,
+        **{action: summarize([seconds for name, seconds, _ in timings if name == action]) for action in COLD_ACTIONS},
+        "latency": summarize([seconds for _, seconds in measured]),
+        "by_action": {
+            action: summarize([seconds for name, seconds in measured if name == action])
+            for action in ACTIONS if any(name == action for name, _ in measured)
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive concurrent simulated sessions and report rerun latency.")
+    parser.add_argument("--sizes", default="10,10000,100000", help="comma-separated catalog sizes (0 = the bundled catalog)")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--actions", type=int, default=20, help="actions per session after the first search")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the catalogs and the simulated users")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(
+        f"{'size':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'reruns/s':>9} {'peak RSS MB':>12} {'errors':>7}",
+        file=sys.stderr
+    )
+    for size in [int(size) for size in args.sizes.split(",") if size]:
+        result = run_size(size, args.sessions, args.actions, args.seed)
+        results.append(result)
+        latency = result["latency"]
+        peak_rss = f"{result['peak_rss_mb']:.1f}" if result["peak_rss_mb"] is not None else "n/a"
+        print(
+            f"{size:>10,} {latency['p50_ms']:>8.1f} {latency['p95_ms']:>8.1f} {latency['p99_ms']:>8.1f} "
+            f"{result['throughput_rps']:>9.1f} {peak_rss:>12} {len(result['errors']):>7}",
+            file=sys.stderr
+        )
+
+    output = {"sessions": args.sessions, "actions": args.actions, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Measure rerun time and websocket traffic of common interactions.
+
+    python -m benchmarks.partial_rerun
+    python -m benchmarks.partial_rerun --size 10000 --repeats 5
+
+Starts the app with `streamlit run`, connects to it over its websocket like a
+browser would and replays a scripted session: apply new slider values, flip
+through the result pages and open a detail expander. Each interaction is sent
+the way the frontend sends it (a widget inside a fragment reruns only that
+fragment) and timed until the server reports the run finished, counting the
+bytes received on the websocket.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.asyncio.client import connect
+
+from benchmarks.synthetic import write_catalog
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+FIND_BUTTON = "Find Your Perfect Pet Match"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Start `streamlit run main.py` on port, with extra environment variables from env
+def start_server(port, catalog_path=None, env=None):
+    env = dict(os.environ, **(env or {}))
+    if catalog_path:
+        env["PET_CATALOG_PATH"] = catalog_path
+    command = [
+        sys.executable, "-m", "streamlit", "run", APP_PATH,
+        "--server.headless=true", f"--server.port={port}", "--server.fileWatcherType=none",
+        "--browser.gatherUsageStats=false",
+    ]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("streamlit server did not start")
+
+
+# A scripted browser session: remembers widget states and the widgets (and
+# their fragments) seen so far, and keeps the forward-message cache the
+# frontend would keep
+class Session:
+    def __init__(self, connection):
+        self.connection = connection
+        self.states = {}
+        self.widgets = {}
+        self.cached_hashes = set()
+
+    async def rerun(self, fragment_id=None, triggers=()):
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.widget_states.widgets.extend(self.states.values())
+        client_state.widget_states.widgets.extend(triggers)
+        client_state.cached_message_hashes.extend(self.cached_hashes)
+        if fragment_id:
+            client_state.fragment_id = fragment_id
+
+        started = time.perf_counter()
+        await self.connection.send(message.SerializeToString())
+        received = messages = 0
+        while True:
+            data = await self.connection.recv()
+            received += len(data)
+            messages += 1
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            if forward.metadata.cacheable:
+                self.cached_hashes.add(forward.hash)
+            if forward.HasField("delta"):
+                self._track(forward.delta)
+            if forward.HasField("script_finished"):
+                break
+        return {"seconds": time.perf_counter() - started, "bytes": received, "messages": messages}
+
+    def _track(self, delta):
+        if delta.HasField("new_element"):
+            element = delta.new_element
+            widget = getattr(element, element.WhichOneof("type"))
+        elif delta.HasField("add_block") and delta.add_block.HasField("expandable"):
+            widget = delta.add_block.expandable
+        else:
+            return
+        if getattr(widget, "id", "") and getattr(widget, "label", ""):
+            # Most recently drawn last, so lookups find the current page's widgets first
+            self.widgets.pop(widget.label, None)
+            self.widgets[widget.label] = (widget.id, delta.fragment_id)
+
+    def widget(self, label):
+        for name, (widget_id, fragment_id) in reversed(self.widgets.items()):
+            if name == label or name.startswith(label):
+                return widget_id, fragment_id
+        raise KeyError(label)
+
+    def set_value(self, label, field, value):
+        widget_id, fragment_id = self.widget(label)
+        state = WidgetState(id=widget_id)
+        if field == "double_array_value":
+            state.double_array_value.data[:] = value
+        else:
+            setattr(state, field, value)
+        self.states[widget_id] = state
+        return fragment_id
+
+    def trigger(self, label):
+        widget_id, fragment_id = self.widget(label)
+        return fragment_id, [WidgetState(id=widget_id, trigger_value=True)]
+
+
+async def run_session(port, repeats, warmup):
+    connection = await connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None)
+    session = Session(connection)
+
+    results = {"initial_load": [await session.rerun()]}
+    fragment_id, triggers = session.trigger(FIND_BUTTON)
+    results["find_matches"] = [await session.rerun(fragment_id, triggers)]
+
+    # The first rounds also warm caches (thumbnails, rendered charts), so they aren't recorded
+    for repeat in range(warmup + repeats):
+        round_results = {}
+
+        # Move two sliders, then apply them together
+        session.set_value("Activity Level", "double_array_value", [0.2 + 0.1 * (repeat % 7)])
+        session.set_value("Lifespan", "double_array_value", [0.9 - 0.1 * (repeat % 7)])
+        fragment_id, triggers = session.trigger(FIND_BUTTON)
+        round_results["apply_sliders"] = await session.rerun(fragment_id, triggers)
+
+        fragment_id = session.set_value("Page", "double_value", 2 + repeat % 2)
+        round_results["change_page"] = await session.rerun(fragment_id)
+
+        fragment_id = session.set_value("View Detailed Analysis", "bool_value", repeat % 2 == 0)
+        round_results["toggle_details"] = await session.rerun(fragment_id)
+
+        if repeat >= warmup:
+            for name, result in round_results.items():
+                results.setdefault(name, []).append(result)
+
+    await connection.close()
+    return {
+        name: {
+            "median_ms": statistics.median(r["seconds"] for r in runs) * 1000,
+            "median_bytes": statistics.median(r["bytes"] for r in runs),
+            "messages": statistics.median(r["messages"] for r in runs),
+            "runs": len(runs),
+        }
+        for name, runs in results.items()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure rerun time and websocket bytes per interaction.")
+    parser.add_argument("--size", type=int, default=1000, help="synthetic catalog size (0 = the bundled catalog)")
+    parser.add_argument("--repeats", type=int, default=5, help="times to repeat each interaction")
+    parser.add_argument("--warmup", type=int, default=2, help="unrecorded rounds before measuring")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog_path = None
+        if args.size:
+            catalog_path = os.path.join(tmp, "pets.jsonl")
+            write_catalog(catalog_path, args.size)
+
+        # A private cache directory (attribute maps, shared results, skyband counts) so
+        # every run starts cold, and no thumbnail warming: it would fetch every pet's
+        # image over the network
+        port = free_port()
+        server = start_server(port, catalog_path, {"PET_ADVISOR_CACHE_DIR": tmp, "PET_ADVISOR_THUMBNAIL_WORKERS": "0"})
+        try:
+            results = asyncio.run(run_session(port, args.repeats, args.warmup))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'interaction':>16} {'median ms':>10} {'median bytes':>13} {'messages':>9}", file=sys.stderr)
+    for name, result in results.items():
+        print(
+            f"{name:>16} {result['median_ms']:>10.1f} {result['median_bytes']:>13,.0f} {result['messages']:>9.0f}",
+            file=sys.stderr
+        )
+
+    output = {"size": args.size, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""Time the stages of a rerun against synthetic catalogs.
+
+    python -m benchmarks.rerun --output bench.json
+    python -m benchmarks.rerun --sizes 10,10000 --baseline bench.json
+
+Results are written as JSON; with --baseline each timing is compared to an
+earlier run and the exit status is 1 if anything got slower than --threshold.
+"""
+import argparse
+import functools
+import json
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import main as app
+from benchmarks.synthetic import synthetic_catalog
+from catalog_index import CatalogIndex
+from mcdm import MCDM_METHODS
+from sensitivity import rank_stability
+from skyband import Skyband
+from scoring import LOWER_IS_BETTER
+from spatial import KDTree
+
+DEFAULT_SIZES = [10, 10_000, 1_000_000]
+
+# Top-k sizes the skyband pruning ratio is reported for (the API's default, a page, the app's default)
+SKYBAND_KS = [3, 10, app.DEFAULT_TOP_K]
+
+# The sidebar's default slider values
+DEFAULT_WEIGHTS = {
+    "space_required": 0.5,
+    "activity_level": 0.5,
+    "time_commitment": 0.5,
+    "cost": 0.5,
+    "allergy_friendly": 0.3,
+    "noise_level": 0.3,
+    "child_friendly": 0.5,
+    "trainability": 0.5,
+    "lifespan": 0.5,
+}
+
+
+# Run func until min_time has passed (at least min_repeats, at most max_repeats times)
+def measure(func, min_time=0.2, min_repeats=3, max_repeats=50):
+    times = []
+    started = time.perf_counter()
+    while len(times) < min_repeats or (time.perf_counter() - started < min_time and len(times) < max_repeats):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return {"median_s": statistics.median(times), "min_s": min(times), "repeats": len(times)}
+
+
+def render_radar(pet):
+    fig = app.create_radar_chart(pet)
+    fig.savefig(app.io.BytesIO(), format="png", bbox_inches="tight")
+    app.pyplot().close(fig)
+
+
+# Benchmarks for one catalog size: name -> zero-argument callable
+def cases(catalog):
+    top_pets = app.calculate_pet_scores(catalog, DEFAULT_WEIGHTS, k=app.DEFAULT_PAGE_SIZE)
+    pet = top_pets[0]
+    compare_rows = [catalog.row_of[p["id"]] for p in top_pets]
+    weights = catalog.engine.weight_vector(DEFAULT_WEIGHTS)
+    ideal = {criterion: 0.0 if criterion in LOWER_IS_BETTER else 1.0 for criterion in DEFAULT_WEIGHTS}
+
+    benchmarks = {
+        "score_full": lambda: app.calculate_pet_scores(catalog, DEFAULT_WEIGHTS),
+        "score_top_k": lambda: app.calculate_pet_scores(catalog, DEFAULT_WEIGHTS, k=app.DEFAULT_TOP_K),
+        # A private copy of the rows isn't recognised by the skyband, so this scores every pet
+        "score_top_k_unpruned": lambda: app.calculate_pet_scores(
+            catalog, DEFAULT_WEIGHTS, k=app.DEFAULT_TOP_K, rows=np.arange(len(catalog))
+        ),
+        "index_build": lambda: CatalogIndex.from_catalog(catalog),
+        "spatial_index_build": lambda: KDTree(catalog.attributes),
+        "ideal_nearest_k": lambda: app.find_closest_pets(catalog, DEFAULT_WEIGHTS, ideal, app.DEFAULT_TOP_K),
+        "type_filter_index": lambda: catalog.index.candidates("Dog"),
+        "type_filter_scan": lambda: [p for p in catalog.pets if p["type"] == "Dog"],
+        "radar_chart_create": lambda: app.pyplot().close(app.create_radar_chart(pet)),
+        "radar_chart_render": lambda: render_radar(pet),
+        "card_html_page": lambda: [app.pet_card_html(p, rank, catalog.revision(p.row)) for rank, p in enumerate(top_pets, start=1)],
+        "attribute_table_build": lambda: app.build_attribute_table(catalog),
+        "attribute_table_page": lambda: [app.pet_attribute_table(catalog, row) for row in compare_rows],
+        "comparison_frame": lambda: app.build_comparison_frame(catalog, compare_rows),
+        "comparison_spec": lambda: app.comparison_chart_spec(catalog, compare_rows),
+        "rank_stability_1k": lambda: rank_stability(catalog, weights, samples=1_000, workers=1),
+    }
+    for method in MCDM_METHODS:
+        benchmarks[f"method_{method.lower()}_top_k"] = functools.partial(
+            app.calculate_pet_scores, catalog, DEFAULT_WEIGHTS, k=app.DEFAULT_TOP_K, method=method
+        )
+    return benchmarks
+
+
+# Share of candidates the skyband rules out for top-k queries, over the whole
+# catalog and per type
+def skyband_pruning(catalog, ks=SKYBAND_KS):
+    filters = {"All Types": catalog.index.all_rows, **catalog.index.type_rows}
+    pruning = []
+    for k in ks:
+        for name, rows in filters.items():
+            band = catalog.skyband.band(rows, k)
+            if band is None:
+                continue
+            pruning.append({
+                "size": len(catalog), "k": k, "filter": name, "candidates": len(rows),
+                "scored": len(band), "pruning_ratio": 1 - len(band) / len(rows) if len(rows) else 0.0,
+            })
+    return pruning
+
+
+def run(sizes, only=None, min_time=0.2):
+    results = []
+    pruning = []
+    for size in sizes:
+        t0 = time.perf_counter()
+        catalog = synthetic_catalog(size)
+        print(f"# {size:,} pets (generated in {time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+
+        # Build the skyband up front, so it isn't built in the background while
+        # other cases are timed (or switch it off when it isn't benchmarked)
+        if only and "skyband_build" not in only:
+            catalog.skyband = Skyband(catalog, k_max=0)
+        else:
+            t0 = time.perf_counter()
+            catalog.skyband.build()
+            results.append({"name": "skyband_build", "size": size, "median_s": time.perf_counter() - t0, "repeats": 1})
+            print(f"{'skyband_build':>22} {size:>10,} {results[-1]['median_s'] * 1000:>12.3f} ms", file=sys.stderr)
+            for entry in skyband_pruning(catalog):
+                pruning.append(entry)
+                if entry["filter"] == "All Types":
+                    label = f"skyband_pruning_k{entry['k']}"
+                    print(f"{label:>22} {size:>10,} {entry['pruning_ratio']:>12.1%}", file=sys.stderr)
+
+        for name, func in cases(catalog).items():
+            if only and name not in only:
+                continue
+            timing = measure(func, min_time=min_time)
+            results.append({"name": name, "size": size, **timing})
+            print(f"{name:>22} {size:>10,} {timing['median_s'] * 1000:>12.3f} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+        "skyband_pruning": pruning,
+    }
+
+
+# Print current vs baseline medians; returns the entries slower than the threshold
+def compare(current, baseline, threshold):
+    previous = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+
+    print(f"{'benchmark':>22} {'size':>10} {'baseline ms':>12} {'current ms':>12} {'change':>8}", file=sys.stderr)
+    for result in current["results"]:
+        before = previous.get((result["name"], result["size"]))
+        if before is None:
+            continue
+        ratio = result["median_s"] / before["median_s"] if before["median_s"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(result)
+            flag = "  REGRESSION"
+        print(
+            f"{result['name']:>22} {result['size']:>10,} {before['median_s'] * 1000:>12.3f} "
+            f"{result['median_s'] * 1000:>12.3f} {ratio - 1:>+8.1%}{flag}",
+            file=sys.stderr
+        )
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scoring, filtering and rendering on synthetic catalogs.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated catalog sizes")
+    parser.add_argument("--only", help="comma-separated benchmark names to run")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds spent per benchmark")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", help="earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    only = set(args.only.split(",")) if args.only else None
+    current = run(sizes, only, args.min_time)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Measure cold-start cost: importing the app and rendering it for the first time.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeats 10 --size 10000 -o startup.json
+
+Every repeat runs in a fresh Python process, like a new worker under
+autoscaling: it times `import main`, then the first run of the landing page
+and the first run that shows results (driven with Streamlit's AppTest), and
+notes which heavy libraries each step loaded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import write_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pandas", "pyarrow", "altair", "matplotlib", "PIL"]
+
+# Runs in the fresh process; prints one JSON object
+CHILD = """
+import json, sys, time
+
+heavy = {heavy!r}
+loaded = lambda: [name for name in heavy if name in sys.modules]
+
+started = time.perf_counter()
+import main
+import_s = time.perf_counter() - started
+after_import = loaded()
+
+from streamlit.testing.v1 import AppTest
+
+app = AppTest.from_file("main.py", default_timeout=600)
+started = time.perf_counter()
+app.run()
+landing_s = time.perf_counter() - started
+after_landing = loaded()
+
+started = time.perf_counter()
+app.button[0].click().run()
+results_s = time.perf_counter() - started
+
+print(json.dumps({{
+    "import_s": import_s,
+    "landing_render_s": landing_s,
+    "results_render_s": results_s,
+    "loaded_after_import": after_import,
+    "loaded_after_landing": after_landing,
+    "loaded_after_results": loaded(),
+}}))
+"""
+
+
+def run_once(catalog_path=None):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # No catalog watcher, shared results cache or files persisted by earlier runs
+        # (attribute maps, skyband counts): every process starts cold. No thumbnail
+        # warming either: it would fetch every pet's image over the network.
+        env = dict(
+            os.environ, PET_CATALOG_POLL_SECONDS="0", PET_ADVISOR_RESULTS_CACHE_BYTES="0",
+            PET_ADVISOR_CACHE_DIR=cache_dir, PET_ADVISOR_THUMBNAIL_WORKERS="0"
+        )
+        if catalog_path:
+            env["PET_CATALOG_PATH"] = catalog_path
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD.format(heavy=HEAVY_MODULES)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    # The app logs JSON lines too; the measurement is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import time and first-render latency in fresh processes.")
+    parser.add_argument("--size", type=int, default=0, help="synthetic catalog size (0 = the bundled catalog)")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh processes to measure")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog_path = None
+        if args.size:
+            catalog_path = os.path.join(tmp, "pets.jsonl")
+            write_catalog(catalog_path, args.size)
+        runs = [run_once(catalog_path) for _ in range(args.repeats)]
+
+    timings = ["import_s", "landing_render_s", "results_render_s"]
+    summary = {name: statistics.median(run[name] for run in runs) for name in timings}
+    for name in ("loaded_after_import", "loaded_after_landing", "loaded_after_results"):
+        summary[name] = runs[-1][name]
+
+    print(f"{'step':>18} {'median ms':>10}", file=sys.stderr)
+    for name in timings:
+        print(f"{name:>18} {summary[name] * 1000:>10.1f}", file=sys.stderr)
+    for name in ("loaded_after_import", "loaded_after_landing", "loaded_after_results"):
+        print(f"{name:>22}: {', '.join(summary[name]) or '-'}", file=sys.stderr)
+
+    output = {"size": args.size, "repeats": args.repeats, "summary": summary, "runs": runs}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
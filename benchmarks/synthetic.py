@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+
+from catalog import Catalog
+from scoring import ATTRIBUTES
+
+PET_TYPES = ["Dog", "Cat", "Bird", "Fish", "Small Pet", "Rabbit"]
+
+
+# Synthetic pets with the same shape as data/pets.jsonl. Attributes are on the
+# catalog's 0.1 grid and loosely correlated within a type, like real breeds.
+def generate_pets(n, seed=0):
+    rng = np.random.default_rng(seed)
+    type_ids = rng.integers(0, len(PET_TYPES), n)
+    type_profiles = rng.uniform(0.2, 0.8, (len(PET_TYPES), len(ATTRIBUTES)))
+    values = np.clip(type_profiles[type_ids] + rng.normal(0, 0.2, (n, len(ATTRIBUTES))), 0.0, 1.0).round(1)
+
+    pets = []
+    for i in range(n):
+        pet_type = PET_TYPES[type_ids[i]]
+        pets.append({
+            "id": i + 1,
+            "name": f"Synthetic {pet_type} {i + 1}",
+            "type": pet_type,
+            "image": f"https://example.invalid/pets/{i + 1}.jpg",
+            "description": f"A synthetic {pet_type.lower()} used for benchmarking.",
+            "attributes": dict(zip(ATTRIBUTES, values[i].tolist())),
+        })
+    return pets
+
+
+# In-memory catalog of n synthetic pets (no file or memory map involved)
+def synthetic_catalog(n, seed=0):
+    pets = generate_pets(n, seed)
+    matrix = np.array([[pet["attributes"][criterion] for criterion in ATTRIBUTES] for pet in pets]).reshape(-1, len(ATTRIBUTES))
+    return Catalog(pets, matrix, version=f"synthetic-{n}-{seed}")
+
+
+# Write n synthetic pets as a JSON Lines catalog file
+def write_catalog(path, n, seed=0):
+    with open(path, "w", encoding="utf-8") as f:
+        for pet in generate_pets(n, seed):
+            f.write(json.dumps(pet) + "\n")
+    return path
@@ -0,0 +1,481 @@
+import csv
+import functools
+import hashlib
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from catalog_index import CatalogIndex
+from mcdm import DecisionMatrix
+from scoring import ATTRIBUTES, ScoringEngine
+from skyband import Skyband
+from spatial import KDTree
+
+# Where the pet catalog and derived files live; both can be overridden per deployment
+DEFAULT_CATALOG_PATH = os.environ.get(
+    "PET_CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pets.jsonl")
+)
+CACHE_DIR = os.environ.get(
+    "PET_ADVISOR_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+
+# How often the catalog file is checked for changes once watched (0 disables the watcher)
+CATALOG_POLL_SECONDS = float(os.environ.get("PET_CATALOG_POLL_SECONDS", 2))
+
+# Reloads changing more than this share of the rows rebuild the index from scratch
+INCREMENTAL_MAX_CHANGED = 0.25
+
+TEXT_FIELDS = ("name", "type", "image", "description")
+
+logger = logging.getLogger("pet_advisor.catalog")
+
+
+class CatalogError(ValueError):
+    pass
+
+
+# Immutable, process-wide pet catalog built from one source file. Reloads
+# publish a new Catalog (a new version) rather than changing this one, so a
+# rerun keeps using the snapshot it started with. revisions[row] is the
+# version in which that pet last changed; per-pet caches key on it.
+class Catalog:
+    def __init__(self, pets, attributes, version, source=None, revisions=None, index=None):
+        self.pets = pets
+        self.attributes = attributes
+        self.version = version
+        self.source = source
+        self.engine = ScoringEngine(attributes)
+        if revisions is None:
+            revisions = np.full(len(pets), version, dtype=object)
+        self.revisions = revisions
+        if index is not None:
+            self.index = index
+        # {line: row} of a JSON Lines source, used by update_catalog
+        self.line_rows = None
+        # Modification time of the source file this snapshot was read from
+        self.modified_ns = None
+        # Changes from the previous snapshot's skyband, for updating its counts
+        self.skyband_change = None
+
+    def __len__(self):
+        return len(self.pets)
+
+    # Type and attribute-range index, built on first use
+    @functools.cached_property
+    def index(self):
+        return CatalogIndex.from_catalog(self)
+
+    # Normalized matrices and ideal vectors shared by the ranking methods
+    @functools.cached_property
+    def decision_matrix(self):
+        return DecisionMatrix(self.engine)
+
+    # KD-tree over the attribute vectors for ideal-profile queries, built on first use
+    @functools.cached_property
+    def spatial_index(self):
+        return KDTree(self.attributes)
+
+    # Per-type k-skyband for pruning top-k queries, built in the background on first use
+    @functools.cached_property
+    def skyband(self):
+        skyband = Skyband(self, change=self.skyband_change)
+        self.skyband_change = None
+        return skyband
+
+    # Pet id -> catalog row, built on first use
+    @functools.cached_property
+    def row_of(self):
+        return {pet["id"]: row for row, pet in enumerate(self.pets)}
+
+    # Version in which the pet at row last changed
+    def revision(self, row):
+        return self.revisions[row]
+
+
+# Read raw records from CSV, JSON Lines or Parquet, chosen by file extension
+def read_records(path):
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".csv":
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                return list(csv.DictReader(f))
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise CatalogError(f"{path}: unreadable CSV ({e})") from e
+
+    if extension in (".jsonl", ".ndjson"):
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in _lines(path, f):
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise CatalogError(f"{path}: line {line_number}: invalid JSON ({e.msg})") from e
+        return records
+
+    if extension in (".parquet", ".pq"):
+        try:
+            import pyarrow
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise CatalogError("Reading Parquet catalogs requires pyarrow (pip install pyarrow)") from e
+        try:
+            return pq.read_table(path).to_pylist()
+        except pyarrow.ArrowException as e:
+            raise CatalogError(f"{path}: unreadable Parquet ({e})") from e
+
+    raise CatalogError(f"{path}: unsupported catalog format '{extension}' (use .csv, .jsonl or .parquet)")
+
+
+# Check one raw record against the catalog schema and return a pet dict.
+# Attributes may be nested under "attributes" (JSON Lines) or flat columns (CSV, Parquet).
+def validate_record(record, row):
+    if not isinstance(record, dict):
+        raise CatalogError(f"row {row}: expected an object, got {type(record).__name__}")
+
+    try:
+        pet_id = int(record["id"])
+    except KeyError:
+        raise CatalogError(f"row {row}: missing field 'id'") from None
+    except (TypeError, ValueError):
+        raise CatalogError(f"row {row}: 'id' must be an integer, got {record['id']!r}") from None
+
+    pet = {"id": pet_id}
+    for field in TEXT_FIELDS:
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise CatalogError(f"row {row}: field '{field}' must be a non-empty string")
+        pet[field] = value
+
+    source = record.get("attributes")
+    if source is None:
+        source = record
+    elif not isinstance(source, dict):
+        raise CatalogError(f"row {row}: 'attributes' must be an object")
+
+    attributes = {}
+    for criterion in ATTRIBUTES:
+        if criterion not in source or source[criterion] in (None, ""):
+            raise CatalogError(f"row {row}: missing attribute '{criterion}'")
+        try:
+            value = float(source[criterion])
+        except (TypeError, ValueError):
+            raise CatalogError(f"row {row}: attribute '{criterion}' must be a number, got {source[criterion]!r}") from None
+        if not math.isfinite(value) or not 0.0 <= value <= 1.0:
+            raise CatalogError(f"row {row}: attribute '{criterion}' must be between 0 and 1, got {value}")
+        attributes[criterion] = value
+    pet["attributes"] = attributes
+
+    return pet
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def attribute_path(version, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"attributes-{version}.npy")
+
+
+# Live arrays backed by each per-version cache file in this process: path -> count
+_mapped = {}
+_mapped_lock = threading.RLock()
+
+
+# Called when an array backed by a cache file is garbage collected. Once
+# nothing in the process uses a file and its version is no longer a published
+# snapshot, the file is superseded and removed. Other processes that still map
+# it keep their pages.
+def _release_cache_file(path, version):
+    with _mapped_lock:
+        _mapped[path] -= 1
+        if _mapped[path]:
+            return
+        del _mapped[path]
+        if any(catalog.version == version for _, catalog in list(_catalogs.values())):
+            return
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Delete path along with the catalog version once array, and every other
+# array backed by it, is garbage collected
+def track_cache_file(array, path, version):
+    with _mapped_lock:
+        _mapped[path] = _mapped.get(path, 0) + 1
+    weakref.finalize(array, _release_cache_file, path, version)
+
+
+# Write an array to path through a temporary file, so concurrent builders never see a partial array
+def save_array(path, array):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npy.tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Persist the attribute matrix once per catalog version and map it read-only,
+# so every worker process on the host shares the same page-cache pages. The
+# file is deleted when the version is superseded and its last map is dropped.
+def attribute_memmap(matrix, version, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = attribute_path(version, cache_dir)
+
+    # Counted before the file is checked, so it can't be removed in between
+    with _mapped_lock:
+        _mapped[path] = _mapped.get(path, 0) + 1
+    try:
+        if not os.path.exists(path):
+            save_array(path, np.ascontiguousarray(matrix, dtype=np.float64))
+        attributes = np.load(path, mmap_mode="r")
+        track_cache_file(attributes, path, version)
+    finally:
+        _release_cache_file(path, version)
+    return attributes
+
+
+# Map the attribute matrix another process already persisted for a version
+def open_attribute_memmap(version, cache_dir=CACHE_DIR):
+    path = attribute_path(version, cache_dir)
+    try:
+        return np.load(path, mmap_mode="r")
+    except FileNotFoundError:
+        raise CatalogError(f"{path}: no cached attributes for catalog version {version}") from None
+
+
+def _validated(path, record, row, seen_ids):
+    try:
+        pet = validate_record(record, row)
+    except CatalogError as e:
+        raise CatalogError(f"{path}: {e}") from None
+    if pet["id"] in seen_ids:
+        raise CatalogError(f"{path}: row {row}: duplicate pet id {pet['id']}")
+    seen_ids.add(pet["id"])
+    return pet
+
+
+# Numbered non-blank lines of an open text file; bytes that aren't valid
+# UTF-8 raise CatalogError
+def _lines(path, f):
+    line_number = 0
+    try:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                yield line_number, line
+    except UnicodeDecodeError as e:
+        # Text is decoded in chunks, so the bad bytes are somewhere after the last line read
+        raise CatalogError(f"{path}: not valid UTF-8 after line {line_number} ({e.reason})") from e
+
+
+# Read and validate every record of a catalog file
+def read_pets(path):
+    seen_ids = set()
+    return [_validated(path, record, row, seen_ids) for row, record in enumerate(read_records(path), start=1)]
+
+
+# JSON Lines catalogs are read line by line, remembering each line, so a
+# reload reuses the previous snapshot's pet for every unchanged line instead
+# of parsing and validating it again. Returns the pets and {line: row}.
+def read_jsonl_pets(path, previous=None):
+    known = previous.line_rows if previous is not None and previous.line_rows is not None else {}
+    pets = []
+    line_rows = {}
+    seen_ids = set()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in _lines(path, f):
+            old_row = known.get(line)
+            if old_row is not None and previous.pets[old_row]["id"] not in seen_ids:
+                pet = previous.pets[old_row]
+                seen_ids.add(pet["id"])
+            else:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise CatalogError(f"{path}: line {line_number}: invalid JSON ({e.msg})") from e
+                pet = _validated(path, record, len(pets) + 1, seen_ids)
+            line_rows[line] = len(pets)
+            pets.append(pet)
+    return pets, line_rows
+
+
+def is_jsonl(path):
+    return os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson")
+
+
+def attribute_rows(pets):
+    return np.array(
+        [[pet["attributes"][criterion] for criterion in ATTRIBUTES] for pet in pets], dtype=np.float64
+    ).reshape(-1, len(ATTRIBUTES))
+
+
+# Load, validate and index a catalog file
+def load_catalog(path, version=None):
+    modified_ns = os.stat(path).st_mtime_ns
+    version = version or file_digest(path)
+    pets, line_rows = read_jsonl_pets(path) if is_jsonl(path) else (read_pets(path), None)
+    catalog = Catalog(pets, attribute_memmap(attribute_rows(pets), version), version, source=path)
+    catalog.line_rows = line_rows
+    catalog.modified_ns = modified_ns
+    return catalog
+
+
+# Build the next snapshot of a catalog from its changed file. Pets are matched
+# by id: unchanged ones keep their record, attribute row and revision, and
+# only added or updated rows are converted and re-indexed. Returns the new
+# Catalog and counts of rows added, updated and removed.
+def update_catalog(previous, path, version=None):
+    modified_ns = os.stat(path).st_mtime_ns
+    version = version or file_digest(path)
+    pets, line_rows = read_jsonl_pets(path, previous) if is_jsonl(path) else (read_pets(path), None)
+
+    previous_rows = previous.row_of
+    source_rows = np.full(len(pets), -1, dtype=np.intp)
+    added = updated = 0
+    for row, pet in enumerate(pets):
+        old_row = previous_rows.get(pet["id"])
+        if old_row is None:
+            added += 1
+        elif previous.pets[old_row] is pet or previous.pets[old_row] == pet:
+            source_rows[row] = old_row
+            pets[row] = previous.pets[old_row]
+        else:
+            updated += 1
+    kept = np.flatnonzero(source_rows >= 0)
+    changed = np.flatnonzero(source_rows < 0)
+    removed = len(previous) - len(kept) - updated
+
+    matrix = np.empty((len(pets), len(ATTRIBUTES)), dtype=np.float64)
+    matrix[kept] = previous.attributes[source_rows[kept]]
+    matrix[changed] = attribute_rows([pets[row] for row in changed])
+
+    revisions = np.empty(len(pets), dtype=object)
+    revisions[kept] = previous.revisions[source_rows[kept]]
+    revisions[changed] = version
+
+    # Patch the previous index if it was built, the change is small and the
+    # kept pets are still in file order; otherwise it is rebuilt on first use
+    index = None
+    if (
+        "index" in previous.__dict__
+        and len(changed) <= INCREMENTAL_MAX_CHANGED * max(len(pets), 1)
+        and np.all(np.diff(source_rows[kept]) > 0)
+    ):
+        index = previous.index.updated(source_rows, [pets[row]["type"] for row in changed], matrix[changed])
+
+    catalog = Catalog(pets, attribute_memmap(matrix, version), version, path, revisions, index)
+    catalog.line_rows = line_rows
+    catalog.modified_ns = modified_ns
+    # Stop counting for the previous snapshot; the new one updates its counts
+    if "skyband" in previous.__dict__:
+        catalog.skyband_change = previous.skyband.retire(source_rows)
+    return catalog, {"rows_added": added, "rows_updated": updated, "rows_removed": removed}
+
+
+# Process-wide catalog cache: path -> (mtime_ns, Catalog)
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+# path -> (stop event, thread) of its watcher
+_watchers = {}
+
+
+# Return the shared catalog for a file. A watched file is kept current by its
+# watcher thread, so this returns its latest snapshot without touching the
+# file; otherwise the file is checked on every call, as refresh_catalog does.
+def get_catalog(path=None):
+    path = os.path.abspath(path or DEFAULT_CATALOG_PATH)
+    cached = _catalogs.get(path)
+    watcher = _watchers.get(path)
+    if cached is not None and watcher is not None and watcher[1].is_alive():
+        return cached[1]
+    return refresh_catalog(path)
+
+
+# Publish a new snapshot if the file changed, and return the current one.
+# A new mtime triggers a re-hash; the catalog is updated only if the content
+# differs, incrementally from the previous snapshot when there is one.
+def refresh_catalog(path=None):
+    path = os.path.abspath(path or DEFAULT_CATALOG_PATH)
+    mtime_ns = os.stat(path).st_mtime_ns
+
+    with _catalogs_lock:
+        cached = _catalogs.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+        version = file_digest(path)
+        if cached is not None and cached[1].version == version:
+            catalog = cached[1]
+        else:
+            started = time.perf_counter()
+            if cached is None:
+                catalog = load_catalog(path, version)
+                changes = {"rows_added": len(catalog), "rows_updated": 0, "rows_removed": 0}
+            else:
+                catalog, changes = update_catalog(cached[1], path, version)
+            logger.info(json.dumps({
+                "event": "catalog_load" if cached is None else "catalog_reload",
+                "path": path,
+                "version": catalog.version,
+                "previous_version": cached[1].version if cached is not None else None,
+                "reload_ms": round((time.perf_counter() - started) * 1000, 3),
+                "rows": len(catalog),
+                **changes,
+                "rows_touched": sum(changes.values()),
+            }))
+
+        _catalogs[path] = (mtime_ns, catalog)
+        return catalog
+
+
+def _watch(path, interval, stop):
+    failed_mtime = None
+    while not stop.wait(interval):
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            if mtime_ns != failed_mtime:
+                refresh_catalog(path)
+        except (OSError, CatalogError) as e:
+            # Keep serving the last good snapshot until the file changes again
+            failed_mtime = mtime_ns if not isinstance(e, OSError) else None
+            logger.warning("Catalog reload failed for %s: %s", path, e)
+        except Exception:
+            # Anything else is a bug, but the watcher must outlive it
+            failed_mtime = mtime_ns
+            logger.exception("Catalog reload failed for %s", path)
+
+
+# Start a daemon thread that polls the catalog file and publishes a new
+# snapshot whenever it changes. Safe to call on every rerun (a watcher that
+# died is replaced); returns the thread's stop event (None when polling is
+# disabled). While no watcher is alive, get_catalog checks the file itself.
+def watch_catalog(path=None, interval=CATALOG_POLL_SECONDS):
+    path = os.path.abspath(path or DEFAULT_CATALOG_PATH)
+    if interval <= 0:
+        return None
+    with _catalogs_lock:
+        watcher = _watchers.get(path)
+        if watcher is None or not (watcher[1].is_alive() or watcher[0].is_set()):
+            stop = threading.Event()
+            thread = threading.Thread(target=_watch, args=(path, interval, stop), name="catalog-watcher", daemon=True)
+            _watchers[path] = (stop, thread)
+            thread.start()
+            watcher = _watchers[path]
+    return watcher[0]
@@ -0,0 +1,117 @@
+import numpy as np
+
+from scoring import ATTRIBUTES
+
+
+# Precomputed lookup structures for filtering a catalog before scoring:
+# a type -> row ids mapping plus every attribute column sorted once
+class CatalogIndex:
+    def __init__(self, types, attributes, criteria=ATTRIBUTES):
+        self.criteria = tuple(criteria)
+        self.size = len(types)
+
+        types = np.asarray(types, dtype=object)
+        self.type_rows = {pet_type: np.flatnonzero(types == pet_type) for pet_type in dict.fromkeys(types.tolist())}
+        self.all_rows = np.arange(self.size)
+        # Unconstrained candidates are these arrays themselves, shared by every caller
+        for rows in (self.all_rows, *self.type_rows.values()):
+            rows.flags.writeable = False
+
+        attributes = np.asarray(attributes).reshape(self.size, len(self.criteria))
+        self.sorted_rows = {}
+        self.sorted_values = {}
+        for j, criterion in enumerate(self.criteria):
+            order = np.argsort(attributes[:, j], kind="stable")
+            self.sorted_rows[criterion] = order
+            self.sorted_values[criterion] = np.ascontiguousarray(attributes[order, j])
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        return cls([pet["type"] for pet in catalog.pets], catalog.attributes)
+
+    # Index of the next catalog snapshot, patched rather than rebuilt.
+    # source_rows[row] is the row an unchanged pet had in this index (-1 for
+    # added or updated rows, whose types and attributes are passed in row
+    # order); rows of removed pets are dropped. Kept rows are remapped and the
+    # changed ones merged into each sorted column, so the result matches a
+    # fresh build. Kept pets must stay in their previous relative order.
+    def updated(self, source_rows, changed_types, changed_attributes):
+        source_rows = np.asarray(source_rows, dtype=np.intp)
+        size = len(source_rows)
+        kept = np.flatnonzero(source_rows >= 0)
+        changed = np.flatnonzero(source_rows < 0)
+        changed_attributes = np.asarray(changed_attributes, dtype=np.float64).reshape(len(changed), len(self.criteria))
+
+        new_row_of = np.full(self.size, -1, dtype=np.intp)
+        new_row_of[source_rows[kept]] = kept
+
+        index = CatalogIndex.__new__(CatalogIndex)
+        index.criteria = self.criteria
+        index.size = size
+
+        changed_types = np.asarray(changed_types, dtype=object)
+        index.type_rows = {}
+        for pet_type in dict.fromkeys([*self.type_rows, *changed_types.tolist()]):
+            rows = self.type_rows.get(pet_type, self.all_rows[:0])
+            rows = new_row_of[rows]
+            rows = np.union1d(rows[rows >= 0], changed[changed_types == pet_type])
+            if len(rows):
+                index.type_rows[pet_type] = rows
+        index.all_rows = np.arange(size)
+        for rows in (index.all_rows, *index.type_rows.values()):
+            rows.flags.writeable = False
+
+        index.sorted_rows = {}
+        index.sorted_values = {}
+        for j, criterion in enumerate(self.criteria):
+            rows = new_row_of[self.sorted_rows[criterion]]
+            keep = rows >= 0
+            rows = rows[keep]
+            values = self.sorted_values[criterion][keep]
+
+            # Insert the changed rows where a stable sort would put them: after
+            # smaller values, and among equal values by row
+            order = np.lexsort((changed, changed_attributes[:, j]))
+            new_values = changed_attributes[order, j]
+            new_rows = changed[order]
+            positions = np.searchsorted(values, new_values, side="left")
+            ties = np.searchsorted(values, new_values, side="right")
+            for i in np.flatnonzero(ties > positions):
+                positions[i] += np.searchsorted(rows[positions[i]:ties[i]], new_rows[i])
+
+            index.sorted_rows[criterion] = np.insert(rows, positions, new_rows)
+            index.sorted_values[criterion] = np.insert(values, positions, new_values)
+        return index
+
+    @property
+    def types(self):
+        return list(self.type_rows)
+
+    # Row ids whose attribute lies within [low, high]; None leaves a bound open
+    def range_rows(self, criterion, low=None, high=None):
+        values = self.sorted_values[criterion]
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        stop = len(values) if high is None else np.searchsorted(values, high, side="right")
+        return self.sorted_rows[criterion][start:stop]
+
+    # Candidate row ids, in catalog order, for a pet type (None for all types)
+    # and hard constraints given as {criterion: (low, high)}. Without
+    # constraints the index's own read-only arrays are returned.
+    def candidates(self, pet_type=None, constraints=None):
+        if not constraints:
+            return self.all_rows if pet_type is None else self.type_rows.get(pet_type, self.all_rows[:0])
+
+        if pet_type is None:
+            mask = np.ones(self.size, dtype=bool)
+        else:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[self.type_rows.get(pet_type, [])] = True
+
+        for criterion, (low, high) in (constraints or {}).items():
+            if criterion not in self.sorted_rows:
+                raise KeyError(f"Unknown attribute '{criterion}'")
+            allowed = np.zeros(self.size, dtype=bool)
+            allowed[self.range_rows(criterion, low, high)] = True
+            mask &= allowed
+
+        return np.flatnonzero(mask)
@@ -0,0 +1,235 @@
+import base64
+import concurrent.futures
+import functools
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+
+from catalog import CACHE_DIR
+
+logger = logging.getLogger("pet_advisor.images")
+
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+
+# Rendered sizes at 2x the CSS size for sharp output on high-density screens:
+# cards show a 150px square, the top-3 hero images about a third of the page
+THUMBNAIL_SIZES = {
+    "card": {"size": (300, 300), "crop": True},
+    "hero": {"size": (600, 600), "crop": False},
+}
+
+THUMBNAIL_QUALITY = 80
+MIME_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+
+FETCH_TIMEOUT = 10
+
+# Threads warming a new catalog's thumbnails in the background; 0 turns warming off
+THUMBNAIL_WORKERS = int(os.environ.get("PET_ADVISOR_THUMBNAIL_WORKERS", 8))
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+
+# Builds of the same source are serialized by one of this many locks, picked by source key
+LOCK_STRIPES = 64
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _local_path(source):
+    if source.startswith("file://"):
+        return urllib.request.url2pathname(urllib.parse.urlparse(source).path)
+    if "://" not in source:
+        return source
+    return None
+
+
+# Stable identity of a source without reading it: remote URLs are treated as
+# immutable, local files are identified by path, size and mtime
+def _source_key(source):
+    path = _local_path(source)
+    if path is None:
+        return _sha256("url", source)
+    stat = os.stat(path)
+    return _sha256("file", os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _fetch(source):
+    path = _local_path(source)
+    if path is not None:
+        with open(path, "rb") as f:
+            return f.read()
+
+    request = urllib.request.Request(source, headers={"User-Agent": "pet-selection-advisor"})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+        data = response.read(MAX_SOURCE_BYTES + 1)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError(f"{source}: image larger than {MAX_SOURCE_BYTES} bytes")
+    return data
+
+
+# WEBP when this Pillow build supports it, else JPEG. Pillow is loaded on
+# first use, not when the app starts.
+@functools.cache
+def thumbnail_format():
+    from PIL import features
+
+    return "WEBP" if features.check("webp") else "JPEG"
+
+
+def _resize(data, spec):
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        if spec["crop"]:
+            image = ImageOps.fit(image, spec["size"], Image.Resampling.LANCZOS)
+        else:
+            image.thumbnail(spec["size"], Image.Resampling.LANCZOS)
+
+        out = io.BytesIO()
+        image.save(out, thumbnail_format(), quality=THUMBNAIL_QUALITY)
+        return out.getvalue()
+
+
+# Content-addressed thumbnail store: a source key points at the source's content
+# hash, and each thumbnail file is named by the hash of (content, size, format),
+# so identical images shared by several pets are stored once
+class ThumbnailCache:
+    def __init__(self, directory=THUMBNAIL_DIR):
+        self.directory = directory
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def _pointer_path(self, source_key):
+        return os.path.join(self.directory, "sources", source_key[:2], source_key)
+
+    def _thumbnail_path(self, content_digest, size):
+        fmt = thumbnail_format()
+        name = _sha256(content_digest, THUMBNAIL_SIZES[size], fmt, THUMBNAIL_QUALITY)
+        return os.path.join(self.directory, name[:2], f"{name}.{EXTENSIONS[fmt]}")
+
+    def _lock(self, source_key):
+        return self._locks[int(source_key[:8], 16) % LOCK_STRIPES]
+
+    # Path of a cached thumbnail, or None if it hasn't been generated yet
+    def lookup(self, source, size):
+        try:
+            with open(self._pointer_path(_source_key(source))) as f:
+                content_digest = f.read().strip()
+        except OSError:
+            return None
+        path = self._thumbnail_path(content_digest, size)
+        return path if os.path.exists(path) else None
+
+    # Generate (if needed) every thumbnail size for a source; returns {size: path}
+    def ensure(self, source, sizes=tuple(THUMBNAIL_SIZES)):
+        source_key = _source_key(source)
+        with self._lock(source_key):
+            paths = {size: self.lookup(source, size) for size in sizes}
+            missing = [size for size, path in paths.items() if path is None]
+            if not missing:
+                return paths
+
+            data = _fetch(source)
+            content_digest = _sha256(data)
+            for size in missing:
+                path = self._thumbnail_path(content_digest, size)
+                if not os.path.exists(path):
+                    _write_atomic(path, _resize(data, THUMBNAIL_SIZES[size]))
+                paths[size] = path
+            _write_atomic(self._pointer_path(source_key), content_digest.encode())
+            return paths
+
+    # Cached thumbnail as bytes, generating it when fetch is allowed; None on failure
+    def get(self, source, size, fetch=False):
+        path = self.lookup(source, size)
+        if path is None and fetch:
+            try:
+                path = self.ensure(source, (size,))[size]
+            except Exception as e:
+                logger.warning("Could not build %s thumbnail for %s: %s", size, source, e)
+                return None
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+
+THUMBNAILS = ThumbnailCache()
+
+
+# Thumbnail as a data URI for inline <img> tags, or the original source if it
+# isn't cached yet, so rendering never waits on the network
+def image_src(source, size="card", fetch=False):
+    data = THUMBNAILS.get(source, size, fetch=fetch)
+    if data is None:
+        return source
+    return f"data:{MIME_TYPES[thumbnail_format()]};base64,{base64.b64encode(data).decode()}"
+
+
+# Thumbnail file path for st.image, or the original source if it isn't cached yet
+def image_path(source, size="hero", fetch=False):
+    path = THUMBNAILS.lookup(source, size)
+    if path is None and fetch and THUMBNAILS.get(source, size, fetch=True) is not None:
+        path = THUMBNAILS.lookup(source, size)
+    return path or source
+
+
+# Build every thumbnail for a catalog; returns the number of images that failed
+def warm_thumbnails(pets, workers=THUMBNAIL_WORKERS):
+    sources = list(dict.fromkeys(pet["image"] for pet in pets))
+    failures = 0
+
+    def build(source):
+        try:
+            THUMBNAILS.ensure(source)
+            return True
+        except Exception as e:
+            logger.warning("Could not build thumbnails for %s: %s", source, e)
+            return False
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for ok in pool.map(build, sources):
+            failures += not ok
+    return failures
+
+
+_warmed_versions = set()
+_warm_lock = threading.Lock()
+
+
+# Warm the thumbnail cache for a catalog version once per process, in the background
+def start_thumbnail_warmup(catalog):
+    if THUMBNAIL_WORKERS <= 0:
+        return
+    with _warm_lock:
+        if catalog.version in _warmed_versions:
+            return
+        _warmed_versions.add(catalog.version)
+
+    thread = threading.Thread(
+        target=warm_thumbnails, args=(catalog.pets,), name="thumbnail-warmup", daemon=True
+    )
+    thread.start()
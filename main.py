@@ -1,20 +1,75 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import json
-import matplotlib.pyplot as plt
-import altair as alt
-from PIL import Image
-import base64
-
-# Set page configuration
-st.set_page_config(
-    page_title="Pet Selection Advisor",
-    page_icon="🐾",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
+import io
+import functools
+import hashlib
+import html
+import uuid
+import weakref
+import logging
+import os
+
+# pandas, pyarrow, altair and matplotlib are imported by the functions that
+# draw charts and tables, so a worker starts (and serves the landing page)
+# without loading them
+
+from catalog import Catalog, get_catalog, watch_catalog
+from images import image_path, image_src, start_thumbnail_warmup
+from mcdm import DecisionMatrix, method_labels, score_with_method
+from profiling import DEBUG_PANEL_ENABLED, RerunProfiler
+from render_cache import CARD_HTML_CACHE, COMPARISON_DATA_CACHE, RADAR_CHART_CACHE
+from results import ScoredResults
+from results_cache import RESULTS_CACHE
+from scoring import ATTRIBUTES, LOWER_IS_BETTER, IncrementalScorer, ScoringEngine, rank_order, top_k
+from sensitivity import DEFAULT_SAMPLES, DEFAULT_SPREAD, stability_job
+from sessions import SESSIONS
+from spatial import nearest_brute_force
+
+# Result display defaults
+DEFAULT_TOP_K = 50
+PAGE_SIZE_OPTIONS = [5, 10, 20, 50]
+DEFAULT_PAGE_SIZE = 10
+
+# Ranking modes offered in the sidebar
+RANKING_MODES = ["Best Weighted Match", "Closest to Ideal Profile"]
+
+# Ideal-profile queries scan the candidates directly when there are fewer than
+# KD_TREE_MIN_ROWS of them or a filter keeps under 1/BRUTE_FORCE_FRACTION of the catalog
+KD_TREE_MIN_ROWS = 50_000
+BRUTE_FORCE_FRACTION = 16
+
+# How often a rerun waiting for a rank-stability analysis updates its progress bar
+STABILITY_POLL_SECONDS = 0.25
+
+# Human-readable attribute names, in catalog column order
+ATTRIBUTE_LABELS = [criterion.replace("_", " ").title() for criterion in ATTRIBUTES]
+PERCENT_LABELS = [f"{percent}%" for percent in range(101)]
+
+# Pet card templates, compiled once. Cards are kept on single lines without
+# blank lines so a page of them stays one HTML block when batched into a
+# single markdown element.
+PET_CARD_HEAD = '<div class="pet-card"><h3>{rank}. {name} <span class="score-badge">{score:.1f}%</span></h3>'.format
+PET_CARD_BODY = (
+    '<div class="pet-card-content">'
+    '<img src="{image}" class="pet-card-image" alt="{name}">'
+    '<div class="pet-card-details">'
+    '<p><strong>Type:</strong> {type}</p>'
+    '<p>{description}</p>'
+    '<p><strong>Key Attributes:</strong></p>'
+    '<ul>{levels}</ul>'
+    '</div></div></div>'
+).format
+PET_CARD_LEVEL = '<li>{label}: {level}</li>'.format
+CARD_ATTRIBUTES = [
+    ("space_required", "Space Required"),
+    ("activity_level", "Activity Level"),
+    ("time_commitment", "Time Commitment"),
+    ("cost", "Cost")
+]
+
+# Radar charts are cached as rendered bytes in this format ("png" or "svg")
+RADAR_CHART_FORMAT = "png"
 
 # Custom CSS to style the application
 def local_css():
@@ -179,252 +234,252 @@ def local_css():
     """, unsafe_allow_html=True)
 
 
-# Sample pet data
+# Load the pet catalog (built once per process and shared across sessions).
+# A background watcher publishes a new snapshot when the file changes; each
+# run keeps the snapshot it got here, and fragments reuse that run's.
 def load_pet_data():
-    pets = {
-        "pets": [
-            {
-                "id": 1,
-                "name": "Golden Retriever",
-                "type": "Dog",
-                "image": "https://images.unsplash.com/photo-1586671267731-da2cf3ceeb80?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80",
-                "description": "Friendly, intelligent, and devoted. Golden Retrievers are excellent family dogs that require moderate exercise.",
-                "attributes": {
-                    "space_required": 0.8,  # 0-1 scale (1 = high)
-                    "activity_level": 0.7,
-                    "time_commitment": 0.8,
-                    "cost": 0.7,
-                    "allergy_friendly": 0.2,
-                    "noise_level": 0.5,
-                    "child_friendly": 0.9,
-                    "trainability": 0.9,
-                    "lifespan": 0.6  # 10-12 years normalized
-                }
-            },
-            {
-                "id": 2,
-                "name": "Siamese Cat",
-                "type": "Cat",
-                "image": "https://images.unsplash.com/photo-1555685812-4b8f594e8e3b?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80",
-                "description": "Vocal, intelligent, and social. Siamese cats form strong bonds with their owners and are more dog-like in their attachment.",
-                "attributes": {
-                    "space_required": 0.4,
-                    "activity_level": 0.5,
-                    "time_commitment": 0.5,
-                    "cost": 0.5,
-                    "allergy_friendly": 0.3,
-                    "noise_level": 0.7,
-                    "child_friendly": 0.7,
-                    "trainability": 0.7,
-                    "lifespan": 0.8  # 12-15 years normalized
-                }
-            },
-            {
-                "id": 3,
-                "name": "Budgerigar (Budgie)",
-                "type": "Bird",
-                "image": "https://images.unsplash.com/photo-1591198936750-16d8e998e7c5?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80",
-                "description": "Small, colorful, and social birds. Budgies are playful and can learn to mimic words and sounds.",
-                "attributes": {
-                    "space_required": 0.2,
-                    "activity_level": 0.6,
-                    "time_commitment": 0.5,
-                    "cost": 0.3,
-                    "allergy_friendly": 0.4,
-                    "noise_level": 0.6,
-                    "child_friendly": 0.6,
-                    "trainability": 0.6,
-                    "lifespan": 0.5  # 5-8 years normalized
-                }
-            },
-            {
-                "id": 4,
-                "name": "Holland Lop Rabbit",
-                "type": "Rabbit",
-                "image": "https://images.unsplash.com/photo-1585110396000-c9ffd4e4b308?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80",
-                "description": "Gentle, calm, and affectionate. Holland Lops are popular pets due to their small size and friendly temperament.",
-                "attributes": {
-                    "space_required": 0.4,
-                    "activity_level": 0.5,
-                    "time_commitment": 0.6,
-                    "cost": 0.4,
-                    "allergy_friendly": 0.5,
-                    "noise_level": 0.1,
-                    "child_friendly": 0.7,
-                    "trainability": 0.5,
-                    "lifespan": 0.5  # 7-10 years normalized
-                }
-            },
-            {
-                "id": 5,
-                "name": "Beagle",
-                "type": "Dog",
-                "image": "https://images.unsplash.com/photo-1505628346881-b72b27e84530?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80",
-                "description": "Curious, merry, and friendly. Beagles are scent hounds with high energy levels and a strong hunting instinct.",
-                "attributes": {
-                    "space_required": 0.6,
-                    "activity_level": 0.8,
-                    "time_commitment": 0.7,
-                    "cost": 0.6,
-                    "allergy_friendly": 0.3,
-                    "noise_level": 0.8,
-                    "child_friendly": 0.9,
-                    "trainability": 0.5,
-                    "lifespan": 0.7  # 12-15 years normalized
-                }
-            },
-            {
-                "id": 6,
-                "name": "Maine Coon Cat",
-                "type": "Cat",
-                "image": "https://images.unsplash.com/photo-1596854407944-02f20dc9d8ee?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80",
-                "description": "Gentle, friendly, and intelligent. Maine Coons are one of the largest domestic cat breeds and are known for their sociable nature.",
-                "attributes": {
-                    "space_required": 0.5,
-                    "activity_level": 0.6,
-                    "time_commitment": 0.5,
-                    "cost": 0.7,
-                    "allergy_friendly": 0.2,
-                    "noise_level": 0.3,
-                    "child_friendly": 0.8,
-                    "trainability": 0.6,
-                    "lifespan": 0.7  # 12-15 years normalized
-                }
-            },
-            {
-                "id": 7,
-                "name": "Syrian Hamster",
-                "type": "Small Pet",
-                "image": "https://images.unsplash.com/photo-1425082661705-1834bfd09dca?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80",
-                "description": "Solitary, nocturnal, and easy to care for. Syrian hamsters are popular beginner pets that require minimal space.",
-                "attributes": {
-                    "space_required": 0.1,
-                    "activity_level": 0.6,
-                    "time_commitment": 0.3,
-                    "cost": 0.2,
-                    "allergy_friendly": 0.6,
-                    "noise_level": 0.2,
-                    "child_friendly": 0.5,
-                    "trainability": 0.2,
-                    "lifespan": 0.2  # 2-3 years normalized
-                }
-            },
-            {
-                "id": 8,
-                "name": "African Grey Parrot",
-                "type": "Bird",
-                "image": "https://images.unsplash.com/photo-1522858547137-f98ab027aeb0?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80",
-                "description": "Highly intelligent and excellent talkers. African Grey Parrots require significant mental stimulation and social interaction.",
-                "attributes": {
-                    "space_required": 0.5,
-                    "activity_level": 0.7,
-                    "time_commitment": 0.9,
-                    "cost": 0.9,
-                    "allergy_friendly": 0.3,
-                    "noise_level": 0.7,
-                    "child_friendly": 0.5,
-                    "trainability": 0.9,
-                    "lifespan": 1.0  # 40-60 years normalized
-                }
-            },
-            {
-                "id": 9,
-                "name": "Betta Fish",
-                "type": "Fish",
-                "image": "https://images.unsplash.com/photo-1545048702-79362797cd2d?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80",
-                "description": "Colorful, solitary fish with distinctive flowing fins. Bettas are relatively easy to care for but require proper water conditions.",
-                "attributes": {
-                    "space_required": 0.1,
-                    "activity_level": 0.2,
-                    "time_commitment": 0.2,
-                    "cost": 0.2,
-                    "allergy_friendly": 1.0,
-                    "noise_level": 0.0,
-                    "child_friendly": 0.4,
-                    "trainability": 0.1,
-                    "lifespan": 0.3  # 3-5 years normalized
-                }
-            },
-            {
-                "id": 10,
-                "name": "Labrador Retriever",
-                "type": "Dog",
-                "image": "https://images.unsplash.com/photo-1591769225440-811ad7d6eab2?ixlib=rb-1.2.1&auto=format&fit=crop&w=800&q=80",
-                "description": "Outgoing, even-tempered, and athletic. Labradors are versatile family dogs that excel in many roles from therapy to search and rescue.",
-                "attributes": {
-                    "space_required": 0.7,
-                    "activity_level": 0.8,
-                    "time_commitment": 0.8,
-                    "cost": 0.7,
-                    "allergy_friendly": 0.2,
-                    "noise_level": 0.5,
-                    "child_friendly": 1.0,
-                    "trainability": 0.9,
-                    "lifespan": 0.7  # 10-14 years normalized
-                }
-            }
-        ]
-    }
-    return pets
-
-
-# Function to calculate weighted scores using WSM
-def calculate_pet_scores(pets_data, user_weights):
-    scored_pets = []
-
-    for pet in pets_data["pets"]:
-        score = 0
-        pet_attributes = pet["attributes"]
-
-        # Calculate the weighted sum
-        for criterion, weight in user_weights.items():
-            if criterion in pet_attributes:
-                # For criteria where lower is better (like cost), invert the score
-                if criterion in ["cost", "noise_level"]:
-                    score += (1 - pet_attributes[criterion]) * weight
-                else:
-                    score += pet_attributes[criterion] * weight
-
-        # Normalize score to a 0-100 scale
-        max_possible_score = sum(user_weights.values())
-        normalized_score = (score / max_possible_score) * 100 if max_possible_score > 0 else 0
-
-        # Add the score to the pet data
-        pet_with_score = pet.copy()
-        pet_with_score["score"] = normalized_score
-        scored_pets.append(pet_with_score)
-
-    # Sort pets by score in descending order
-    scored_pets.sort(key=lambda x: x["score"], reverse=True)
-    return scored_pets
-
-
-# Function to display pet recommendation cards
-def display_pet_card(pet, rank):
-    with st.container():
-        st.markdown(f"""
-        <div class="pet-card">
-            <h3>{rank}. {pet['name']} <span class="score-badge">{pet['score']:.1f}%</span></h3>
-            <div class="pet-card-content">
-                <img src="{pet['image']}" class="pet-card-image" alt="{pet['name']}">
-                <div class="pet-card-details">
-                    <p><strong>Type:</strong> {pet['type']}</p>
-                    <p>{pet['description']}</p>
-                    <p><strong>Key Attributes:</strong></p>
-                    <ul>
-                        <li>Space Required: {'High' if pet['attributes']['space_required'] > 0.6 else 'Medium' if pet['attributes']['space_required'] > 0.3 else 'Low'}</li>
-                        <li>Activity Level: {'High' if pet['attributes']['activity_level'] > 0.6 else 'Medium' if pet['attributes']['activity_level'] > 0.3 else 'Low'}</li>
-                        <li>Time Commitment: {'High' if pet['attributes']['time_commitment'] > 0.6 else 'Medium' if pet['attributes']['time_commitment'] > 0.3 else 'Low'}</li>
-                        <li>Cost: {'High' if pet['attributes']['cost'] > 0.6 else 'Medium' if pet['attributes']['cost'] > 0.3 else 'Low'}</li>
-                    </ul>
-                </div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+    watch_catalog()
+    return get_catalog()
+
+
+# Function to calculate weighted scores (WSM unless another registered method
+# is picked); with row ids, only those candidate rows are scored, and a
+# session's IncrementalScorer (which carries its own candidate rows) reuses
+# work from the previous WSM call. Returns ScoredResults, best first.
+def calculate_pet_scores(pets_data, user_weights, k=None, rows=None, scorer=None, method="WSM"):
+    # Score the whole catalog at once with a single matrix-vector product
+    if isinstance(pets_data, Catalog):
+        pets = pets_data.pets
+        engine = pets_data.engine
+    else:
+        pets = pets_data["pets"]
+        engine = ScoringEngine.from_pets(pets)
+    weights = engine.weight_vector(user_weights)
+
+    # A WSM top k over a whole type (or the whole catalog) only needs to score
+    # the pets dominated by fewer than k others, when that beats a full scan
+    # (a session scorer that already ranked these weights answers for free)
+    band_rows = None
+    if (
+        method == "WSM" and isinstance(pets_data, Catalog) and weights.min() >= 0 and weights.sum() > 0
+        and (scorer is None or (tuple(weights.tolist()), k) not in scorer.memo)
+    ):
+        band_rows = pets_data.skyband.candidates(scorer.rows if scorer is not None else rows, k)
+
+    # Sort pets by score in descending order, or only pick the best k
+    if band_rows is not None:
+        rows = band_rows
+        scores = engine.score(weights, rows=rows)
+        order = top_k(scores, k)
+        ranked_scores = scores[order]
+    elif scorer is not None and method == "WSM":
+        rows = scorer.rows
+        ranked_scores, order = scorer.rank(weights, k)
+    else:
+        if scorer is not None:
+            rows = scorer.rows
+        if method == "WSM":
+            scores = engine.score(weights, rows=rows)
+        else:
+            decision = pets_data.decision_matrix if isinstance(pets_data, Catalog) else DecisionMatrix(engine)
+            scores = score_with_method(method, decision, weights, rows)
+        order = rank_order(scores) if k is None else top_k(scores, k)
+        ranked_scores = scores[order]
+
+    # Ranked catalog rows and their scores; pets are read through views, not copied
+    return ScoredResults(pets, order if rows is None else np.asarray(rows)[order], ranked_scores)
+
+
+# Function to find the pets closest to an ideal attribute profile, with the
+# user's weights scaling each axis of the distance
+def find_closest_pets(catalog, user_weights, ideal_profile, k, rows=None):
+    weights = catalog.engine.weight_vector(user_weights)
+    target = catalog.engine.weight_vector(ideal_profile)
+
+    rows = np.arange(len(catalog)) if rows is None else np.asarray(rows)
+    if len(rows) < KD_TREE_MIN_ROWS or len(rows) <= len(catalog) // BRUTE_FORCE_FRACTION:
+        # Few candidates (small catalog or narrow filter): scanning them beats walking the tree
+        found, distances = nearest_brute_force(catalog.attributes, rows, target, k, weights)
+    elif len(rows) == len(catalog):
+        found, distances = catalog.spatial_index.query(target, k, weights)
+    else:
+        mask = np.zeros(len(catalog), dtype=bool)
+        mask[rows] = True
+        found, distances = catalog.spatial_index.query(target, k, weights, mask)
+
+    # Turn the weighted distance into a 0-100 match, where 100 is the ideal itself
+    total = weights.sum()
+    if total > 0:
+        similarity = 100 * (1 - np.sqrt(np.clip(distances / total, 0, 1)))
+    else:
+        similarity = np.full(len(found), 100.0)
+
+    return ScoredResults(catalog.pets, found, similarity)
+
+
+# Function to resolve the type filter and hard constraints to candidate rows
+# using the catalog index, and build an incremental scorer over them
+def build_scorer(catalog, selected_type, constraints, key, profiler):
+    with profiler.span("filtering"):
+        candidate_rows = catalog.index.candidates(None if selected_type == "All Types" else selected_type, constraints)
+    return IncrementalScorer(catalog.engine, candidate_rows, key=key)
+
+
+# Function to describe an attribute value as High, Medium or Low
+def attribute_level(value):
+    return 'High' if value > 0.6 else 'Medium' if value > 0.3 else 'Low'
+
+
+# Function to build the static part of a pet card (image, type, description,
+# attribute levels), cached per pet and revision (the catalog version in which
+# the pet last changed), so a catalog reload only re-renders the changed pets.
+# Cards whose thumbnail isn't ready yet aren't cached, so they pick it up on a
+# later rerun.
+def pet_card_body(pet, revision):
+    key = (pet["id"], revision)
+    body = CARD_HTML_CACHE.get(key)
+    if body is None:
+        src = image_src(pet['image'], 'card')
+        body = PET_CARD_BODY(
+            image=html.escape(src),
+            name=html.escape(pet['name']),
+            type=html.escape(pet['type']),
+            description=html.escape(pet['description']),
+            levels="".join(
+                PET_CARD_LEVEL(label=label, level=attribute_level(pet['attributes'][attr]))
+                for attr, label in CARD_ATTRIBUTES
+            )
+        )
+        if src != pet['image']:
+            CARD_HTML_CACHE.put(key, body)
+    return body
+
+
+# Function to build the HTML of a pet recommendation card; only the rank,
+# name and score are filled in per rerun
+def pet_card_html(pet, rank, revision):
+    return PET_CARD_HEAD(rank=rank, name=html.escape(pet['name']), score=pet['score']) + pet_card_body(pet, revision)
+
+
+# Function to display a page of pet recommendation cards as one element
+def display_pet_cards(catalog, pets, first_rank):
+    cards = [
+        pet_card_html(pet, rank, catalog.revision(pet.row))
+        for rank, pet in enumerate(pets, start=first_rank)
+    ]
+    st.markdown("\n".join(cards), unsafe_allow_html=True)
+
+
+# Function to build the long-format data behind the comparison chart: one
+# vectorized melt of the selected rows' attribute columns
+def build_comparison_frame(catalog, rows):
+    import pandas as pd
+
+    rows = np.asarray(rows, dtype=np.intp)
+    names = [catalog.pets[row]["name"] for row in rows.tolist()]
+    return pd.DataFrame({
+        "Pet": np.repeat(names, len(ATTRIBUTES)),
+        "Attribute": np.tile(ATTRIBUTE_LABELS, len(rows)),
+        "Value": catalog.attributes[rows].ravel()
+    })
+
+
+# Function to build the comparison chart's Vega-Lite spec once; it refers to
+# its data by name, so the same spec serves every selection
+@functools.cache
+def comparison_chart_template():
+    import altair as alt
+
+    return alt.Chart(alt.NamedData(name="compare")).mark_bar().encode(
+        x=alt.X('Pet:N', title='Pet'),
+        y=alt.Y('Value:Q', title='Score (0-1)', scale=alt.Scale(domain=[0, 1])),
+        color=alt.Color('Pet:N', legend=alt.Legend(title="Pet")),
+        column=alt.Column('Attribute:N', title=None)
+    ).properties(
+        width=90,
+        height=200
+    ).configure_view(
+        stroke=None
+    ).to_dict()
+
+
+# Function to get the comparison chart spec for some catalog rows. The data is
+# serialized to Arrow once per compared pets (and their revisions) and named by its content
+# hash, so an unchanged comparison produces an identical message that
+# Streamlit's forward-message cache doesn't send to the browser again.
+# Returns (spec, payload size in bytes, whether the data was cached).
+def comparison_chart_spec(catalog, rows):
+    key = tuple((catalog.pets[row]["id"], catalog.revision(row)) for row in rows)
+    data = COMPARISON_DATA_CACHE.get(key)
+    cache_hit = data is not None
+    if data is None:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(build_comparison_frame(catalog, rows), preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        data = sink.getvalue().to_pybytes()
+        COMPARISON_DATA_CACHE.put(key, data)
+
+    name = f"compare-{hashlib.sha1(data).hexdigest()[:16]}"
+    spec = {**comparison_chart_template(), "data": {"name": name}}
+    payload_bytes = len(json.dumps(spec)) + len(data)
+    spec["datasets"] = {name: data}
+    return spec, payload_bytes, cache_hit
+
+
+# Function to build the formatted attribute table for the whole catalog.
+# Values are rounded to whole percents and both columns are categoricals over
+# a handful of labels, so the table stays small even for a million pets; each
+# pet's rows are a contiguous block that pet_attribute_table() slices out
+# without copying.
+def build_attribute_table(catalog):
+    import pandas as pd
+
+    n, m = len(catalog), len(ATTRIBUTES)
+    percents = np.rint(np.clip(np.asarray(catalog.attributes).reshape(-1) * 100, 0, 100)).astype(np.int8)
+    return pd.DataFrame({
+        "Attribute": pd.Categorical.from_codes(np.tile(np.arange(m, dtype=np.int8), n), ATTRIBUTE_LABELS),
+        "Value": pd.Categorical.from_codes(percents, PERCENT_LABELS)
+    })
+
+
+# Attribute tables, built once per catalog version and held weakly by their
+# catalog, so a retired snapshot's table goes when the snapshot does
+_attribute_tables = weakref.WeakKeyDictionary()
+
+
+# Function to get the catalog's attribute table, building it on first use
+def attribute_table(catalog):
+    table = _attribute_tables.get(catalog)
+    if table is None:
+        table = _attribute_tables[catalog] = build_attribute_table(catalog)
+    return table
+
+
+# Function to get one pet's rows of the catalog-wide attribute table
+def pet_attribute_table(catalog, row):
+    m = len(ATTRIBUTES)
+    return attribute_table(catalog).iloc[row * m:(row + 1) * m]
+
+
+# Function to import pyplot on first use, with the non-interactive Agg
+# backend: charts are only ever rendered to image bytes, from server threads
+@functools.cache
+def pyplot():
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
 
 
 # Function to create a radar chart for pet attributes
 def create_radar_chart(pet):
+    plt = pyplot()
+
     # Prepare data for radar chart
     attributes = list(pet["attributes"].keys())
     values = list(pet["attributes"].values())
@@ -460,8 +515,231 @@ def create_radar_chart(pet):
     return fig
 
 
+# Function to render a radar chart to image bytes, reusing cached renders of
+# the same pet revision
+def render_radar_chart(pet, revision, fmt=RADAR_CHART_FORMAT):
+    key = (pet["id"], revision, fmt)
+    image = RADAR_CHART_CACHE.get(key)
+    if image is not None:
+        return image
+
+    fig = create_radar_chart(pet)
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, bbox_inches="tight")
+        image = buffer.getvalue()
+    finally:
+        # Release the figure so pyplot's registry does not grow on a long-lived server
+        pyplot().close(fig)
+
+    RADAR_CHART_CACHE.put(key, image)
+    return image
+
+
+# Function to show the top 3 recommendations side by side
+def display_top_recommendations(top_pets):
+    cols = st.columns(3)
+
+    for i, (col, pet) in enumerate(zip(cols, top_pets)):
+        with col:
+            st.image(image_path(pet["image"], "hero"), caption=f"{i + 1}. {pet['name']}", width="stretch")
+            st.markdown(
+                f"<h3 style='text-align: center;'>{html.escape(pet['name'])} <span class='score-badge'>{pet['score']:.1f}%</span></h3>",
+                unsafe_allow_html=True)
+            st.markdown(f"<p style='text-align: center;'><strong>Type:</strong> {html.escape(pet['type'])}</p>",
+                        unsafe_allow_html=True)
+
+
+# Function to show one page of pet cards with their detail expanders
+@st.fragment
+def display_detailed_results(catalog, scored_pets, page_size, profiler):
+    fragment_profiler = profiler.for_fragment("detailed_results")
+
+    # Only build the cards on the current page
+    page_count = (len(scored_pets) - 1) // page_size + 1
+    if page_count > 1:
+        # Keep the remembered page valid when the result set shrinks
+        if st.session_state.get("results_page", 1) > page_count:
+            st.session_state.results_page = page_count
+        page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="results_page")
+    else:
+        page = 1
+
+    start = (page - 1) * page_size
+    page_pets = scored_pets[start:start + page_size]
+    st.caption(f"Showing {start + 1}-{start + len(page_pets)} of {len(scored_pets)} matches")
+
+    with fragment_profiler.span("card_html"):
+        display_pet_cards(catalog, page_pets, start + 1)
+
+    for pet in page_pets:
+        # Add a "View Details" expander for each pet; tracking its state lets
+        # its contents be built and sent only once the expander is opened
+        details = st.expander(
+            f"View Detailed Analysis for {pet['name']}",
+            key=f"details_{pet['id']}",
+            on_change="rerun"
+        )
+        if not details.open:
+            continue
+        with details:
+            col1, col2 = st.columns([1, 1])
+
+            with col1:
+                st.markdown(f"### {pet['name']} Profile")
+                st.markdown(f"**Description:** {pet['description']}")
+
+                with fragment_profiler.span("attribute_tables"):
+                    # Display this pet's slice of the shared attribute table
+                    st.table(pet_attribute_table(catalog, pet.row), hide_index=True)
+
+            with col2:
+                # Display radar chart
+                with fragment_profiler.span("radar_charts"):
+                    st.image(render_radar_chart(pet, catalog.revision(pet.row)))
+
+    if fragment_profiler is not profiler:
+        fragment_profiler.finish()
+
+
+# Function to show the comparison chart for a chosen set of ranked pets and,
+# for weighted rankings (method set), their rank stability
+@st.fragment
+def display_comparison(catalog, scored_pets, weights, candidate_rows, filter_key, method, profiler):
+    fragment_profiler = profiler.for_fragment("comparison")
+
+    # Pick any of the ranked pets to compare; pets dropped by a filter
+    # change are deselected, and an empty selection falls back to the top 3
+    ranked = {pet["id"]: pet for pet in scored_pets}
+    compare_ids = [pet_id for pet_id in st.session_state.get("compare_pets", []) if pet_id in ranked]
+    st.session_state.compare_pets = compare_ids or [pet["id"] for pet in scored_pets[:3]]
+    compare_ids = st.multiselect(
+        "Pets to compare",
+        list(ranked),
+        format_func=lambda pet_id: ranked[pet_id]["name"],
+        key="compare_pets"
+    )
+
+    with fragment_profiler.span("comparison_chart"):
+        compare_rows = [ranked[pet_id].row for pet_id in compare_ids]
+        spec, payload_bytes, cache_hit = comparison_chart_spec(catalog, compare_rows)
+        st.vega_lite_chart(spec, width="stretch")
+    fragment_profiler.annotate(
+        comparison_pets=len(compare_rows), comparison_payload_bytes=payload_bytes, comparison_cache_hit=cache_hit
+    )
+
+    # How often each pet stays on top when the sliders are nudged a little
+    if method is not None and st.toggle(
+        "Show rank stability",
+        help=f"Re-rank {DEFAULT_SAMPLES:,} random variations of your slider values "
+             f"(±{DEFAULT_SPREAD:g} on average) to see how robust your top 3 is. "
+             "Large candidate sets take a while; the analysis keeps running if you change something meanwhile."
+    ):
+        # The analysis runs in the background; waiting in short steps lets any
+        # interaction interrupt this rerun (progress updates are where Streamlit
+        # checks), while the analysis itself carries on and is reused later
+        job = stability_job(catalog, weights, candidate_rows, filter_key=filter_key, method=method)
+        with fragment_profiler.span("rank_stability"):
+            if not job.done.is_set():
+                progress = st.progress(job.progress, text=f"Re-ranking {job.samples:,} variations...")
+                while not job.done.wait(STABILITY_POLL_SECONDS):
+                    progress.progress(job.progress, text=f"Re-ranking {job.samples:,} variations...")
+                progress.empty()
+        fragment_profiler.annotate(rank_stability_samples=job.samples)
+        if job.error is not None:
+            st.error(f"Rank stability failed: {job.error}")
+        else:
+            display_rank_stability(catalog, job.result)
+            st.caption(f"Based on {job.samples:,} variations of your slider values.")
+
+    if fragment_profiler is not profiler:
+        fragment_profiler.finish()
+
+
+# Function to show how often each pet ranks first / in the top 3 under perturbed weights
+def display_rank_stability(catalog, stability, max_rows=10):
+    if not stability:
+        st.info("No rank-stability data for the current filters.")
+        return
+    import pandas as pd
+
+    frame = pd.DataFrame({
+        "Pet": [catalog.pets[entry["row"]]["name"] for entry in stability[:max_rows]],
+        "P(rank 1)": [entry["p_first"] for entry in stability[:max_rows]],
+        "P(top 3)": [entry["p_top"] for entry in stability[:max_rows]],
+    })
+    st.dataframe(
+        frame,
+        hide_index=True,
+        column_config={
+            "P(rank 1)": st.column_config.ProgressColumn(format="percent", min_value=0.0, max_value=1.0),
+            "P(top 3)": st.column_config.ProgressColumn(format="percent", min_value=0.0, max_value=1.0),
+        },
+    )
+
+# Function to show the hidden debug panel with this rerun's stage timings
+def display_debug_panel(profiler, catalog):
+    import pandas as pd
+
+    if profiler.cprofile_report is not None:
+        st.session_state.cprofile_report = profiler.cprofile_report
+
+    with st.sidebar.expander("Debug: Rerun Profile"):
+        st.markdown(f"**Total:** {profiler.total * 1000:.1f} ms")
+        st.table(pd.DataFrame({
+            'Stage': list(profiler.stages.keys()),
+            'Time (ms)': [f"{seconds * 1000:.2f}" for seconds in profiler.stages.values()],
+            'Calls': list(profiler.counts.values())
+        }))
+
+        if profiler.fields:
+            st.markdown("**Rerun details**")
+            st.json(profiler.fields)
+
+        st.markdown("**Sessions**")
+        st.markdown(
+            f"This session: {SESSIONS.session_bytes(st.session_state.session_id) / 1024:.1f} KiB of cached results; "
+            f"shared catalog: {len(catalog):,} pets, {catalog.engine.matrix.nbytes / 1024 ** 2:.1f} MiB of attributes"
+        )
+        st.json(SESSIONS.stats())
+
+        st.markdown("**Radar chart cache**")
+        st.json(RADAR_CHART_CACHE.stats())
+
+        st.markdown("**Card HTML cache**")
+        st.json(CARD_HTML_CACHE.stats())
+
+        st.markdown("**Comparison data cache**")
+        st.json(COMPARISON_DATA_CACHE.stats())
+
+        st.markdown("**Shared results cache**")
+        st.json(RESULTS_CACHE.stats())
+
+        st.markdown("**Top-k skyband**")
+        st.json(catalog.skyband.stats())
+
+        if st.button("Capture cProfile for next rerun"):
+            st.session_state.capture_cprofile = True
+            st.rerun()
+        if "cprofile_report" in st.session_state:
+            st.code(st.session_state.cprofile_report, language=None)
+
+
 # Main application
 def main():
+    # Set page configuration (here rather than at import time, so other entry
+    # points such as api.py can import this module)
+    st.set_page_config(
+        page_title="Pet Selection Advisor",
+        page_icon="🐾",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+
+    # Time each stage of this rerun; the debug panel can also capture a cProfile run
+    debug_enabled = DEBUG_PANEL_ENABLED or st.query_params.get("debug") == "1"
+    profiler = RerunProfiler(capture_cprofile=debug_enabled and st.session_state.pop("capture_cprofile", False))
+
     # Apply custom CSS
     local_css()
 
@@ -479,115 +757,204 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
-    # Sidebar for user inputs
-    st.sidebar.markdown('<h2 style="color: #4e89ae;">Your Preferences</h2>', unsafe_allow_html=True)
-    st.sidebar.markdown('Adjust the sliders to indicate how important each factor is to you:')
-
-    # User preference inputs
+    # Sidebar for user inputs. Every setting (preferences, filters, ranking mode
+    # and display options) sits in one form, so changing them doesn't rerun
+    # anything until they're applied together
     user_weights = {}
-
-    user_weights["space_required"] = st.sidebar.slider(
-        "Available Space",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.5,
-        step=0.1,
-        help="How important is the amount of space the pet requires? Higher value means you prioritize pets that need less space."
-    )
-
-    user_weights["activity_level"] = st.sidebar.slider(
-        "Activity Level",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.5,
-        step=0.1,
-        help="How important is the pet's activity level? Higher value means you prefer more active pets."
-    )
-
-    user_weights["time_commitment"] = st.sidebar.slider(
-        "Time Available",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.5,
-        step=0.1,
-        help="How important is the amount of time required for pet care? Higher value means you have more time available."
-    )
-
-    user_weights["cost"] = st.sidebar.slider(
-        "Budget Consideration",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.5,
-        step=0.1,
-        help="How important is the cost of keeping the pet? Higher value means cost is a significant factor."
-    )
-
-    user_weights["allergy_friendly"] = st.sidebar.slider(
-        "Allergy Concerns",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.3,
-        step=0.1,
-        help="How important is it that the pet is allergy-friendly? Higher value means you need a hypoallergenic pet."
-    )
-
-    user_weights["noise_level"] = st.sidebar.slider(
-        "Noise Sensitivity",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.3,
-        step=0.1,
-        help="How important is the pet's noise level? Higher value means you prefer quieter pets."
-    )
-
-    user_weights["child_friendly"] = st.sidebar.slider(
-        "Child Friendliness",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.5,
-        step=0.1,
-        help="How important is it that the pet is good with children? Higher value means you prioritize child-friendly pets."
-    )
-
-    user_weights["trainability"] = st.sidebar.slider(
-        "Trainability",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.5,
-        step=0.1,
-        help="How important is it that the pet is easy to train? Higher value means you prefer highly trainable pets."
-    )
-
-    user_weights["lifespan"] = st.sidebar.slider(
-        "Lifespan",
-        min_value=0.0,
-        max_value=1.0,
-        value=0.5,
-        step=0.1,
-        help="How important is the pet's lifespan? Higher value means you prefer pets with longer lifespans."
-    )
-
-    # Additional filters
-    st.sidebar.markdown('<h3 style="color: #4e89ae;">Additional Filters</h3>', unsafe_allow_html=True)
-
-    pet_types = ["All Types", "Dog", "Cat", "Bird", "Fish", "Small Pet", "Rabbit"]
-    selected_type = st.sidebar.selectbox("Pet Type", pet_types)
+    with st.sidebar.form("preferences", border=False):
+        st.markdown('<h2 style="color: #4e89ae;">Your Preferences</h2>', unsafe_allow_html=True)
+        st.markdown('Adjust the sliders to indicate how important each factor is to you:')
+
+        # User preference inputs
+        user_weights["space_required"] = st.slider(
+            "Available Space",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.5,
+            step=0.1,
+            help="How important is the amount of space the pet requires? Higher value means you prioritize pets that need less space."
+        )
+
+        user_weights["activity_level"] = st.slider(
+            "Activity Level",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.5,
+            step=0.1,
+            help="How important is the pet's activity level? Higher value means you prefer more active pets."
+        )
+
+        user_weights["time_commitment"] = st.slider(
+            "Time Available",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.5,
+            step=0.1,
+            help="How important is the amount of time required for pet care? Higher value means you have more time available."
+        )
+
+        user_weights["cost"] = st.slider(
+            "Budget Consideration",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.5,
+            step=0.1,
+            help="How important is the cost of keeping the pet? Higher value means cost is a significant factor."
+        )
+
+        user_weights["allergy_friendly"] = st.slider(
+            "Allergy Concerns",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.3,
+            step=0.1,
+            help="How important is it that the pet is allergy-friendly? Higher value means you need a hypoallergenic pet."
+        )
+
+        user_weights["noise_level"] = st.slider(
+            "Noise Sensitivity",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.3,
+            step=0.1,
+            help="How important is the pet's noise level? Higher value means you prefer quieter pets."
+        )
+
+        user_weights["child_friendly"] = st.slider(
+            "Child Friendliness",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.5,
+            step=0.1,
+            help="How important is it that the pet is good with children? Higher value means you prioritize child-friendly pets."
+        )
+
+        user_weights["trainability"] = st.slider(
+            "Trainability",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.5,
+            step=0.1,
+            help="How important is it that the pet is easy to train? Higher value means you prefer highly trainable pets."
+        )
+
+        user_weights["lifespan"] = st.slider(
+            "Lifespan",
+            min_value=0.0,
+            max_value=1.0,
+            value=0.5,
+            step=0.1,
+            help="How important is the pet's lifespan? Higher value means you prefer pets with longer lifespans."
+        )
+
+        # Additional filters
+        st.markdown('<h3 style="color: #4e89ae;">Additional Filters</h3>', unsafe_allow_html=True)
+
+        pet_types = ["All Types", "Dog", "Cat", "Bird", "Fish", "Small Pet", "Rabbit"]
+        selected_type = st.selectbox("Pet Type", pet_types)
+
+        # Optional hard constraints: pets outside a range are excluded before scoring
+        constraints = {}
+        with st.expander("Hard Constraints"):
+            st.markdown("Only consider pets whose attributes fall within these ranges.")
+            for criterion in ATTRIBUTES:
+                low, high = st.slider(
+                    criterion.replace("_", " ").title(),
+                    min_value=0.0,
+                    max_value=1.0,
+                    value=(0.0, 1.0),
+                    step=0.1,
+                    key=f"constraint_{criterion}"
+                )
+                if (low, high) != (0.0, 1.0):
+                    constraints[criterion] = (low, high)
+
+        # Ranking mode: weighted sum, or distance to an ideal profile scaled by the weights above.
+        # Widgets in a form can't appear or hide before it is applied, so both
+        # modes' settings are always shown; the ideal profile opens in its mode.
+        st.markdown('<h3 style="color: #4e89ae;">Ranking Mode</h3>', unsafe_allow_html=True)
+        ranking_mode = st.radio(
+            "Ranking Mode",
+            RANKING_MODES,
+            label_visibility="collapsed",
+            help="Closest to Ideal Profile finds the pets nearest to the attribute values you describe below."
+        )
+
+        labels = method_labels()
+        method = st.selectbox(
+            "Decision Method",
+            list(labels),
+            format_func=labels.get,
+            help="How the weighted criteria are combined into one score (Best Weighted Match only)."
+        )
+
+        ideal_profile = {}
+        with st.expander("Ideal Profile", expanded=ranking_mode == RANKING_MODES[1]):
+            st.markdown(
+                "For Closest to Ideal Profile: describe your ideal pet; the weights above set how much each attribute counts."
+            )
+            for criterion in ATTRIBUTES:
+                ideal_profile[criterion] = st.slider(
+                    criterion.replace("_", " ").title(),
+                    min_value=0.0,
+                    max_value=1.0,
+                    value=0.0 if criterion in LOWER_IS_BETTER else 1.0,
+                    step=0.1,
+                    key=f"ideal_{criterion}"
+                )
+
+        # Display options
+        st.markdown('<h3 style="color: #4e89ae;">Display Options</h3>', unsafe_allow_html=True)
+
+        top_k_results = st.number_input(
+            "Number of Results",
+            min_value=3,
+            value=DEFAULT_TOP_K,
+            step=1,
+            help="How many of the best-matching pets to rank and show."
+        )
+
+        page_size = st.selectbox(
+            "Results per Page",
+            PAGE_SIZE_OPTIONS,
+            index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE)
+        )
+
+        # Find your match button
+        if st.form_submit_button("Find Your Perfect Pet Match"):
+            st.session_state.results_ready = True
 
     # Load pet data
-    pets_data = load_pet_data()
-
-    # Filter by pet type if not "All Types"
-    if selected_type != "All Types":
-        filtered_pets = {"pets": [pet for pet in pets_data["pets"] if pet["type"] == selected_type]}
-    else:
-        filtered_pets = pets_data
+    with profiler.span("catalog_load"):
+        pets_data = load_pet_data()
+    catalog_version = pets_data.version
+
+    # Build right-sized thumbnails for the whole catalog in the background
+    start_thumbnail_warmup(pets_data)
+
+    # The session keeps one incremental scorer per (catalog, filter) combination
+    # in the shared session registry, so a single slider move only updates the
+    # previous scores and idle sessions' caches can be reclaimed
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    scorer_key = (catalog_version, selected_type, tuple(sorted(constraints.items())))
+    scorer = SESSIONS.scorer(
+        session_id, scorer_key, lambda: build_scorer(pets_data, selected_type, constraints, scorer_key, profiler)
+    )
+    candidate_rows = scorer.rows
 
     # Calculate scores
-    scored_pets = calculate_pet_scores(filtered_pets, user_weights)
-
-    # Find your match button
-    if st.sidebar.button("Find Your Perfect Pet Match"):
-        st.session_state.results_ready = True
+    with profiler.span("scoring"):
+        if ranking_mode == RANKING_MODES[1]:
+            scored_pets = find_closest_pets(pets_data, user_weights, ideal_profile, int(top_k_results), candidate_rows)
+        else:
+            # Rankings on the slider grid are shared with every process on the host
+            filter_key = (None if selected_type == "All Types" else selected_type, tuple(sorted(constraints.items())))
+            scored_pets, cache_hit = RESULTS_CACHE.scored(
+                pets_data, pets_data.engine.weight_vector(user_weights), filter_key, method, int(top_k_results),
+                lambda: calculate_pet_scores(pets_data, user_weights, k=int(top_k_results), scorer=scorer, method=method)
+            )
+            profiler.annotate(results_cache_hit=cache_hit)
+    profiler.annotate(catalog_version=catalog_version, method=method, candidates=len(candidate_rows), results=len(scored_pets))
 
     # Display results
     if 'results_ready' in st.session_state and st.session_state.results_ready:
@@ -596,89 +963,23 @@ def main():
         st.markdown('<h2 class="section-title">Your Top Pet Recommendations</h2>', unsafe_allow_html=True)
 
         if len(scored_pets) > 0:
-            # Display top 3 pets
             top_pets = scored_pets[:3]
-
-            # Create columns for top 3
-            cols = st.columns(3)
-
-            for i, (col, pet) in enumerate(zip(cols, top_pets)):
-                with col:
-                    st.image(pet["image"], caption=f"{i + 1}. {pet['name']}", use_column_width=True)
-                    st.markdown(
-                        f"<h3 style='text-align: center;'>{pet['name']} <span class='score-badge'>{pet['score']:.1f}%</span></h3>",
-                        unsafe_allow_html=True)
-                    st.markdown(f"<p style='text-align: center;'><strong>Type:</strong> {pet['type']}</p>",
-                                unsafe_allow_html=True)
-
+            display_top_recommendations(top_pets)
             st.markdown('</div>', unsafe_allow_html=True)
 
-            # Detailed results
+            # Detailed results and the comparison are fragments: paging, opening
+            # a detail expander or changing the comparison reruns only that part
             st.markdown('<div class="section-container">', unsafe_allow_html=True)
             st.markdown('<h2 class="section-title">Detailed Results</h2>', unsafe_allow_html=True)
-
-            # Show detailed cards for all recommended pets
-            for i, pet in enumerate(scored_pets):
-                display_pet_card(pet, i + 1)
-
-                # Add a "View Details" expander for each pet
-                with st.expander(f"View Detailed Analysis for {pet['name']}"):
-                    col1, col2 = st.columns([1, 1])
-
-                    with col1:
-                        st.markdown(f"### {pet['name']} Profile")
-                        st.markdown(f"**Description:** {pet['description']}")
-
-                        # Create a table of attributes
-                        attributes_df = pd.DataFrame({
-                            'Attribute': list(pet['attributes'].keys()),
-                            'Value': list(pet['attributes'].values())
-                        })
-
-                        # Format the values as percentages
-                        attributes_df['Value'] = attributes_df['Value'].apply(lambda x: f"{x * 100:.0f}%")
-
-                        # Display the table
-                        st.table(attributes_df)
-
-                    with col2:
-                        # Display radar chart
-                        radar_fig = create_radar_chart(pet)
-                        st.pyplot(radar_fig)
-
+            display_detailed_results(pets_data, scored_pets, page_size, profiler)
             st.markdown('</div>', unsafe_allow_html=True)
 
-            # Comparison chart for top pets
             st.markdown('<div class="section-container">', unsafe_allow_html=True)
             st.markdown('<h2 class="section-title">Compare Top Recommendations</h2>', unsafe_allow_html=True)
-
-            # Prepare data for comparison chart
-            compare_data = []
-            for pet in top_pets:
-                for attr, value in pet["attributes"].items():
-                    compare_data.append({
-                        "Pet": pet["name"],
-                        "Attribute": attr.replace("_", " ").title(),
-                        "Value": value
-                    })
-
-            df_compare = pd.DataFrame(compare_data)
-
-            # Create a grouped bar chart using Altair
-            chart = alt.Chart(df_compare).mark_bar().encode(
-                x=alt.X('Pet:N', title='Pet'),
-                y=alt.Y('Value:Q', title='Score (0-1)', scale=alt.Scale(domain=[0, 1])),
-                color=alt.Color('Pet:N', legend=alt.Legend(title="Pet")),
-                column=alt.Column('Attribute:N', title=None)
-            ).properties(
-                width=90,
-                height=200
-            ).configure_view(
-                stroke=None
+            display_comparison(
+                pets_data, scored_pets, pets_data.engine.weight_vector(user_weights), candidate_rows,
+                scorer_key, method if ranking_mode == RANKING_MODES[0] else None, profiler
             )
-
-            st.altair_chart(chart, use_container_width=True)
-
             st.markdown('</div>', unsafe_allow_html=True)
         else:
             st.warning("No pets found matching your criteria. Please adjust your preferences.")
@@ -728,7 +1029,29 @@ def main():
         </div>
         """, unsafe_allow_html=True)
 
+    # Reclaim cached results from idle sessions and account for this one
+    SESSIONS.evict()
+    profiler.annotate(session_bytes=SESSIONS.session_bytes(session_id))
+
+    profiler.finish()
+    if debug_enabled:
+        display_debug_panel(profiler, pets_data)
+
+
+# Function to send the app's JSON log lines (per-rerun timings, catalog
+# reloads) to stderr when the app runs on its own; processes that import this
+# module (the API, benchmarks) set up logging themselves
+def configure_logging():
+    app_logger = logging.getLogger("pet_advisor")
+    if not app_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        app_logger.addHandler(handler)
+        app_logger.setLevel(os.environ.get("PET_ADVISOR_LOG_LEVEL", "INFO"))
+
+
 if __name__ == "__main__":
+    configure_logging()
     # Khởi tạo session state nếu chưa có
     if 'results_ready' not in st.session_state:
         st.session_state.results_ready = False
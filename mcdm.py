@@ -0,0 +1,146 @@
+import functools
+
+import numpy as np
+
+# Smallest benefit used by the Weighted Product Method, so a 0 attribute
+# contributes a tiny factor instead of log(0)
+WPM_FLOOR = 1e-6
+
+# Saaty's random consistency index by matrix size, for the AHP consistency ratio
+RANDOM_INDEX = {1: 0.0, 2: 0.0, 3: 0.58, 4: 0.90, 5: 1.12, 6: 1.24, 7: 1.32, 8: 1.41, 9: 1.45, 10: 1.49}
+
+# Registered ranking methods: key -> (label, scoring function)
+MCDM_METHODS = {}
+
+
+def register_method(key, label):
+    def decorator(func):
+        MCDM_METHODS[key] = (label, func)
+        return func
+    return decorator
+
+
+# Catalog-level matrices shared by every method and request. Everything here
+# depends only on the catalog, so it is computed once per catalog version and
+# each derived matrix only when a method first needs it.
+class DecisionMatrix:
+    def __init__(self, engine):
+        self.engine = engine
+
+    # Attributes with lower-is-better criteria flipped, so higher is always better
+    @functools.cached_property
+    def benefit(self):
+        matrix = self.engine.matrix
+        return np.where(self.engine.invert, 1.0 - matrix, matrix)
+
+    @functools.cached_property
+    def column_norms(self):
+        norms = np.sqrt((self.benefit ** 2).sum(axis=0))
+        return np.where(norms > 0, norms, 1.0)
+
+    # Vector-normalized benefit matrix used by TOPSIS
+    @functools.cached_property
+    def normalized(self):
+        return self.benefit / self.column_norms
+
+    @functools.cached_property
+    def ideal(self):
+        return self.normalized.max(axis=0) if len(self.normalized) else np.zeros(self.normalized.shape[1])
+
+    @functools.cached_property
+    def anti_ideal(self):
+        return self.normalized.min(axis=0) if len(self.normalized) else np.zeros(self.normalized.shape[1])
+
+    # Squared per-criterion gaps to the ideal and anti-ideal; a weighted distance
+    # is then one matrix product with the squared weights
+    @functools.cached_property
+    def ideal_gaps(self):
+        return (self.normalized - self.ideal) ** 2
+
+    @functools.cached_property
+    def anti_ideal_gaps(self):
+        return (self.normalized - self.anti_ideal) ** 2
+
+    @functools.cached_property
+    def log_benefit(self):
+        return np.log(np.maximum(self.benefit, WPM_FLOOR))
+
+
+def _rows(matrix, rows):
+    return matrix if rows is None else matrix[rows]
+
+
+# Every method scores one weight vector (m,) -> (n,) or a batch (k, m) -> (n, k) on a 0-100 scale
+def _as_batch(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights.ndim == 1, np.atleast_2d(weights)
+
+
+@register_method("WSM", "Weighted Sum (WSM)")
+def weighted_sum(decision, weights, rows=None):
+    return decision.engine.score(weights, rows=rows)
+
+
+@register_method("WPM", "Weighted Product (WPM)")
+def weighted_product(decision, weights, rows=None):
+    single, batch = _as_batch(weights)
+    totals = batch.sum(axis=1)
+    exponents = np.divide(batch, totals[:, None], out=np.zeros_like(batch), where=totals[:, None] > 0)
+
+    scores = np.exp(_rows(decision.log_benefit, rows) @ exponents.T) * 100
+    scores[:, totals <= 0] = 0.0
+    return scores[:, 0] if single else scores
+
+
+@register_method("TOPSIS", "TOPSIS")
+def topsis(decision, weights, rows=None):
+    single, batch = _as_batch(weights)
+    squared = (batch ** 2).T
+
+    to_ideal = np.sqrt(_rows(decision.ideal_gaps, rows) @ squared)
+    to_anti_ideal = np.sqrt(_rows(decision.anti_ideal_gaps, rows) @ squared)
+    spread = to_ideal + to_anti_ideal
+
+    scores = np.divide(to_anti_ideal, spread, out=np.zeros_like(spread), where=spread > 0) * 100
+    return scores[:, 0] if single else scores
+
+
+# AHP priorities from slider weights: each pair of criteria is compared on
+# Saaty's 1-9 scale by the difference of their sliders, and the priorities are
+# the principal eigenvector of that reciprocal matrix. Returns (priorities,
+# consistency ratio), batched like the inputs.
+def ahp_weights(weights, iterations=50):
+    single, batch = _as_batch(weights)
+    m = batch.shape[1]
+
+    difference = batch[:, :, None] - batch[:, None, :]
+    comparisons = np.where(difference >= 0, 1 + 8 * difference, 1 / (1 - 8 * difference))
+
+    priorities = np.full((len(batch), m), 1.0 / m)
+    for _ in range(iterations):
+        priorities = np.einsum("kij,kj->ki", comparisons, priorities)
+        priorities /= priorities.sum(axis=1, keepdims=True)
+
+    lambda_max = (np.einsum("kij,kj->ki", comparisons, priorities) / priorities).mean(axis=1)
+    random_index = RANDOM_INDEX.get(m, 1.49)
+    consistency = (lambda_max - m) / (m - 1) / random_index if m > 2 else np.zeros(len(batch))
+
+    return (priorities[0], consistency[0]) if single else (priorities, consistency)
+
+
+@register_method("AHP", "AHP-weighted Sum")
+def ahp_weighted_sum(decision, weights, rows=None):
+    priorities, _ = ahp_weights(weights)
+    return decision.engine.score(priorities, rows=rows)
+
+
+def method_labels():
+    return {key: label for key, (label, _) in MCDM_METHODS.items()}
+
+
+def score_with_method(method, decision, weights, rows=None):
+    try:
+        _, func = MCDM_METHODS[method]
+    except KeyError:
+        raise ValueError(f"Unknown ranking method '{method}'") from None
+    return func(decision, weights, rows)
@@ -0,0 +1,90 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+
+logger = logging.getLogger("pet_advisor.rerun")
+
+# Turns on the hidden debug panel for every session (it can also be opened with ?debug=1)
+DEBUG_PANEL_ENABLED = os.environ.get("PET_ADVISOR_DEBUG", "") not in ("", "0", "false")
+
+CPROFILE_TOP_N = 30
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "started")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+# Timing spans for one rerun of main(). Spans with the same name accumulate,
+# so a stage that runs once per card reports its total and call count.
+class RerunProfiler:
+    def __init__(self, capture_cprofile=False):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self.fields = {}
+        self.total = None
+        self.cprofile_report = None
+        self._cprofile = None
+        if capture_cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    # Profiler for a fragment's stages: this one while the whole script runs,
+    # or a fresh one (finished and logged by the fragment) when only the
+    # fragment reruns
+    def for_fragment(self, name):
+        if self.total is None:
+            return self
+        profiler = RerunProfiler()
+        profiler.annotate(fragment=name)
+        return profiler
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    # Extra context for the log line, e.g. catalog version or result count
+    def annotate(self, **fields):
+        self.fields.update(fields)
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            out = io.StringIO()
+            pstats.Stats(self._cprofile, stream=out).sort_stats("cumulative").print_stats(CPROFILE_TOP_N)
+            self.cprofile_report = out.getvalue()
+            self._cprofile = None
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(self.summary(), default=str))
+        return self
+
+    def summary(self):
+        return {
+            "event": "rerun",
+            "total_ms": round((self.total or 0.0) * 1000, 3),
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+            "stage_calls": dict(self.counts),
+            **self.fields,
+        }
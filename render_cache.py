@@ -0,0 +1,74 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+# Thread-safe LRU cache of rendered bytes, bounded by total size rather than entry count
+class LRUBytesCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        # Entries larger than the whole budget are simply not cached
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+
+            self._entries[key] = value
+            self.size += len(value)
+
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Process-wide cache of rendered radar charts, keyed by (pet id, pet revision, format)
+RADAR_CHART_CACHE = LRUBytesCache(int(os.environ.get("PET_ADVISOR_RADAR_CACHE_BYTES", 32 * 1024 * 1024)))
+
+# Arrow-serialized comparison chart datasets, keyed by the compared (pet id, revision) pairs
+COMPARISON_DATA_CACHE = LRUBytesCache(int(os.environ.get("PET_ADVISOR_COMPARE_CACHE_BYTES", 8 * 1024 * 1024)))
+
+# Static pet card HTML, keyed by (pet id, pet revision); sized by string length
+CARD_HTML_CACHE = LRUBytesCache(int(os.environ.get("PET_ADVISOR_CARD_CACHE_BYTES", 16 * 1024 * 1024)))
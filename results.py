@@ -0,0 +1,58 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+
+# Read-only view of one scored pet: the catalog's record, shared rather than
+# copied, plus the score. Reads like the pet dict with an extra "score" key.
+class PetView(Mapping):
+    __slots__ = ("pet", "row", "score")
+
+    def __init__(self, pet, row, score):
+        self.pet = pet
+        self.row = row
+        self.score = score
+
+    def __getitem__(self, key):
+        if key == "score":
+            return self.score
+        return self.pet[key]
+
+    def __iter__(self):
+        yield from self.pet
+        yield "score"
+
+    def __len__(self):
+        return len(self.pet) + 1
+
+    def __repr__(self):
+        return f"PetView(row={self.row}, name={self.pet.get('name')!r}, score={self.score:.4f})"
+
+
+# Ranked results as two aligned arrays (catalog rows and scores, best first)
+# over the shared list of catalog pets. Slicing returns another ScoredResults
+# backed by array views; indexing or iterating yields PetViews on demand.
+class ScoredResults:
+    __slots__ = ("pets", "rows", "scores")
+
+    def __init__(self, pets, rows, scores):
+        self.pets = pets
+        self.rows = np.asarray(rows, dtype=np.intp)
+        self.scores = np.asarray(scores, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ScoredResults(self.pets, self.rows[index], self.scores[index])
+        row = int(self.rows[index])
+        return PetView(self.pets[row], row, float(self.scores[index]))
+
+    def __iter__(self):
+        pets = self.pets
+        for row, score in zip(self.rows.tolist(), self.scores.tolist()):
+            yield PetView(pets[row], row, score)
+
+    def __repr__(self):
+        return f"ScoredResults({len(self)} pets)"
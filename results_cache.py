@@ -0,0 +1,280 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from catalog import CACHE_DIR
+from results import ScoredResults
+
+# Shared by every worker process on the host; size 0 turns the cache off
+RESULTS_CACHE_PATH = os.environ.get("PET_ADVISOR_RESULTS_CACHE_PATH", os.path.join(CACHE_DIR, "results.sqlite"))
+RESULTS_CACHE_MAX_BYTES = int(os.environ.get("PET_ADVISOR_RESULTS_CACHE_BYTES", 64 * 1024 * 1024))
+
+# The sliders' step: weights on this grid are cached, anything else is scored directly
+WEIGHT_STEP = 0.1
+
+# Entries are evicted down to this share of the budget, so inserts don't evict every time
+EVICT_TO = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    catalog TEXT NOT NULL,
+    version TEXT NOT NULL,
+    ids BLOB NOT NULL,
+    scores BLOB NOT NULL,
+    complete INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+CREATE INDEX IF NOT EXISTS results_catalog ON results (catalog, version);
+
+-- When each catalog version's file was written, so a process still serving
+-- an old version can tell it has been superseded
+CREATE TABLE IF NOT EXISTS versions (
+    catalog TEXT NOT NULL,
+    version TEXT NOT NULL,
+    modified INTEGER NOT NULL,
+    PRIMARY KEY (catalog, version)
+);
+
+-- Running total of entry sizes, so checking the budget doesn't scan the table
+CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO usage VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results
+    BEGIN UPDATE usage SET bytes = bytes + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results
+    BEGIN UPDATE usage SET bytes = bytes - OLD.size; END;
+"""
+
+
+# Weights as integer multiples of WEIGHT_STEP, or None when any is off the grid
+def quantize_weights(weights):
+    steps = np.rint(np.asarray(weights, dtype=np.float64) / WEIGHT_STEP)
+    if not np.allclose(steps * WEIGHT_STEP, weights, rtol=0.0, atol=1e-9):
+        return None
+    return steps.astype(np.int64).tolist()
+
+
+# Ranked results (top-k pet ids and scores) in an SQLite file shared by all
+# processes on the host, keyed by quantized weights, filter, method and
+# catalog version. Stores for a newer catalog version drop the older
+# versions' entries, and stores for a superseded version are skipped;
+# the least recently used entries go when the file outgrows max_bytes. The
+# cache never fails a request: database errors count as misses.
+class ResultsCache:
+    def __init__(self, path=RESULTS_CACHE_PATH, max_bytes=RESULTS_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._idle = []
+        self._ready = False
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.stale = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        # Rows replaced by INSERT OR REPLACE fire the delete trigger too
+        connection.execute("PRAGMA recursive_triggers=ON")
+        return connection
+
+    # A connection from the process's pool. Streamlit runs every rerun on a
+    # new thread, so connections are shared between threads rather than opened
+    # per thread; the file is switched to WAL (which lets readers in other
+    # processes proceed during writes) and given its schema once per process.
+    @contextlib.contextmanager
+    def _connection(self):
+        with self._lock:
+            if not self._ready:
+                try:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                except OSError as e:
+                    # Handled like any database error: the cache misses, the request goes on
+                    raise sqlite3.OperationalError(f"cannot create the results cache directory: {e}") from e
+                connection = self._connect()
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+                self._idle.append(connection)
+                self._ready = True
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            with self._lock:
+                self._idle.append(connection)
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    # Cache key for a ranking, or None when it shouldn't be cached
+    def key(self, catalog, weights, filter_key, method):
+        steps = quantize_weights(weights)
+        if steps is None:
+            return None
+        return json.dumps([catalog.version, steps, filter_key, method], default=str)
+
+    # Cached ScoredResults with at least k pets (fewer only if that is all the
+    # candidates there are), or None
+    def get(self, catalog, key, k=None):
+        try:
+            with self._connection() as connection:
+                row = connection.execute(
+                    "SELECT ids, scores, complete FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or not (row[2] or (k is not None and len(row[0]) // 8 >= k)):
+                    self._count(misses=1)
+                    return None
+                connection.execute(
+                    "UPDATE results SET hits = hits + 1, last_used = ? WHERE key = ?", (time.time(), key)
+                )
+        except sqlite3.Error:
+            self._count(misses=1, errors=1)
+            return None
+
+        ids = np.frombuffer(row[0], dtype=np.int64)[:k]
+        scores = np.frombuffer(row[1], dtype=np.float64)[:k]
+        row_of = catalog.row_of
+        self._count(hits=1)
+        return ScoredResults(catalog.pets, [row_of[pet_id] for pet_id in ids.tolist()], scores)
+
+    # Store a ranking; complete means it holds every candidate, not just the top k
+    def put(self, catalog, key, results, complete):
+        ids = np.array([catalog.pets[row]["id"] for row in results.rows.tolist()], dtype=np.int64).tobytes()
+        scores = np.ascontiguousarray(results.scores, dtype=np.float64).tobytes()
+        size = len(key) + len(ids) + len(scores)
+        catalog_name = catalog.source or ""
+        try:
+            with self._connection() as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    stored = self._store(connection, catalog_name, catalog.version, catalog.modified_ns or 0, (
+                        key, catalog_name, catalog.version, ids, scores, int(complete), size, time.time()
+                    ))
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+                if stored:
+                    self._evict(connection)
+        except sqlite3.Error:
+            self._count(errors=1)
+
+    # Store one entry unless its catalog version has been superseded, in one
+    # transaction. Versions are ordered by when their file was written (a file
+    # reverted to older content counts as new again), whichever process stored
+    # them; storing for the newest removes the older versions' entries.
+    def _store(self, connection, catalog_name, version, modified, entry):
+        connection.execute(
+            "INSERT INTO versions (catalog, version, modified) VALUES (?, ?, ?) "
+            "ON CONFLICT (catalog, version) DO UPDATE SET modified = MAX(modified, excluded.modified)",
+            (catalog_name, version, modified)
+        )
+        modified, newest = connection.execute(
+            "SELECT modified, (SELECT MAX(modified) FROM versions WHERE catalog = ?) FROM versions "
+            "WHERE catalog = ? AND version = ?",
+            (catalog_name, catalog_name, version)
+        ).fetchone()
+        if modified < newest:
+            self._count(stale=1)
+            return False
+
+        removed = connection.execute(
+            "DELETE FROM results WHERE catalog = ? AND version IN "
+            "(SELECT version FROM versions WHERE catalog = ? AND modified < ?)",
+            (catalog_name, catalog_name, modified)
+        ).rowcount
+        self._count(evictions=max(removed, 0))
+
+        connection.execute(
+            "INSERT OR REPLACE INTO results (key, catalog, version, ids, scores, complete, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            entry
+        )
+        self._count(stores=1)
+        return True
+
+    def _evict(self, connection):
+        total = connection.execute("SELECT bytes FROM usage").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in connection.execute("SELECT key, size FROM results ORDER BY last_used"):
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            doomed.append((key,))
+            total -= size
+        connection.execute("BEGIN")
+        try:
+            connection.executemany("DELETE FROM results WHERE key = ?", doomed)
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        self._count(evictions=len(doomed))
+
+    # Ranked results for weights, from the cache when possible; compute() does
+    # the scoring on a miss and must return at least the top k. Returns
+    # (results, whether they came from the cache).
+    def scored(self, catalog, weights, filter_key, method, k, compute):
+        key = self.key(catalog, weights, filter_key, method) if self.enabled else None
+        if key is None:
+            return compute(), False
+        results = self.get(catalog, key, k)
+        if results is not None:
+            return results, True
+        results = compute()
+        self.put(catalog, key, results, complete=k is None or len(results) < k)
+        return results, False
+
+    def clear(self):
+        try:
+            with self._connection() as connection:
+                connection.execute("DELETE FROM results")
+        except sqlite3.Error:
+            self._count(errors=1)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "stale_stores_skipped": self.stale,
+                "evictions": self.evictions,
+                "errors": self.errors,
+                "max_bytes": self.max_bytes,
+            }
+        # Host-wide figures, across every process sharing the file
+        try:
+            with self._connection() as connection:
+                entries, hits = connection.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM results").fetchone()
+                size = connection.execute("SELECT bytes FROM usage").fetchone()[0]
+            stats.update(entries=entries, bytes=size, shared_hits=hits)
+        except sqlite3.Error:
+            pass
+        return stats
+
+
+# Process-wide handle on the host's results cache
+RESULTS_CACHE = ResultsCache()
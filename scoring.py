@@ -0,0 +1,179 @@
+from collections import OrderedDict
+
+import numpy as np
+
+# Criteria in the order they appear in each pet's "attributes" and in the sidebar
+ATTRIBUTES = (
+    "space_required",
+    "activity_level",
+    "time_commitment",
+    "cost",
+    "allergy_friendly",
+    "noise_level",
+    "child_friendly",
+    "trainability",
+    "lifespan",
+)
+
+# Criteria where a lower attribute value is better for the user
+LOWER_IS_BETTER = ("cost", "noise_level")
+
+# Scores equal to this many decimals count as ties when ranking, so pets that
+# tie mathematically keep their catalog order whatever the float rounding
+RANK_DECIMALS = 9
+
+
+# Vectorized Weighted Sum Method over a whole catalog
+class ScoringEngine:
+    def __init__(self, attributes, criteria=ATTRIBUTES, lower_is_better=LOWER_IS_BETTER):
+        self.criteria = tuple(criteria)
+        self.matrix = np.ascontiguousarray(attributes, dtype=np.float64).reshape(-1, len(self.criteria))
+
+        # (1 - x) * w == x * (-w) + w, so inverted criteria become a sign flip
+        # on the weight plus a constant offset, and the matrix stays untouched
+        self.invert = np.array([criterion in lower_is_better for criterion in self.criteria])
+        self.sign = np.where(self.invert, -1.0, 1.0)
+
+    @classmethod
+    def from_pets(cls, pets, criteria=ATTRIBUTES, lower_is_better=LOWER_IS_BETTER):
+        matrix = np.array(
+            [[pet["attributes"][criterion] for criterion in criteria] for pet in pets],
+            dtype=np.float64,
+        )
+        return cls(matrix, criteria, lower_is_better)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    # Turn a {criterion: weight} dict into a weight vector in engine order
+    def weight_vector(self, user_weights):
+        return np.array([user_weights.get(criterion, 0.0) for criterion in self.criteria], dtype=np.float64)
+
+    # Score every pet for one weight vector (shape (m,) -> (n,)) or for a
+    # batch of weight vectors (shape (k, m) -> (n, k)), normalized to 0-100.
+    # Passing row ids scores only those rows, in the given order.
+    def score(self, weights, rows=None):
+        weights = np.asarray(weights, dtype=np.float64)
+        single = weights.ndim == 1
+        batch = np.atleast_2d(weights)
+
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        raw = matrix @ (batch * self.sign).T + batch[:, self.invert].sum(axis=1)
+        totals = batch.sum(axis=1)
+
+        scores = np.zeros_like(raw)
+        positive = totals > 0
+        scores[:, positive] = raw[:, positive] / totals[positive] * 100
+
+        return scores[:, 0] if single else scores
+
+    # Raw (unnormalized) contribution of one criterion at a given weight
+    def contribution(self, criterion_index, weight, rows=None):
+        column = self.matrix[:, criterion_index] if rows is None else self.matrix[rows, criterion_index]
+        return column * (self.sign[criterion_index] * weight) + (weight if self.invert[criterion_index] else 0.0)
+
+
+# Order row ids by descending score, breaking ties by catalog order
+def rank_order(scores):
+    return np.argsort(-np.round(scores, RANK_DECIMALS), kind="stable")
+
+
+# Row ids of the k best scores in rank order, using partial selection (O(n))
+# instead of a full sort; ties at the cut-off go to the earliest catalog rows
+def top_k(scores, k):
+    if k >= len(scores):
+        return rank_order(scores)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    keys = -np.round(scores, RANK_DECIMALS)
+    cutoff = np.partition(keys, k - 1)[k - 1]
+
+    above = np.flatnonzero(keys < cutoff)
+    ties = np.flatnonzero(keys == cutoff)[: k - len(above)]
+    rows = np.sort(np.concatenate([above, ties]))
+
+    return rows[np.argsort(keys[rows], kind="stable")]
+
+
+# Row ids of the k best scores for every column of an (n, c) score matrix,
+# shape (k, c), with the same tie-break as rank_order. Rounded scores and row
+# ids are packed into one int64 key so a single partition is exact.
+def top_k_batch(scores, k):
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((0, scores.shape[1]), dtype=np.intp)
+
+    keys = -np.rint(scores * 10.0 ** RANK_DECIMALS).astype(np.int64) * n + np.arange(n)[:, None]
+    if k < n:
+        candidates = np.argpartition(keys, k - 1, axis=0)[:k]
+    else:
+        candidates = np.broadcast_to(np.arange(n)[:, None], keys.shape)
+
+    order = np.argsort(np.take_along_axis(keys, candidates, axis=0), axis=0)
+    return np.take_along_axis(candidates, order, axis=0)
+
+
+# Per-session scorer that keeps the last raw score vector, so moving a single
+# slider costs one scaled column update instead of a full matrix product, and
+# weight tuples seen before return their memoized ranking straight away
+class IncrementalScorer:
+    # Full recompute after this many incremental updates, to bound rounding drift
+    RECOMPUTE_EVERY = 64
+    MEMO_SIZE = 32
+
+    def __init__(self, engine, rows=None, key=None):
+        self.engine = engine
+        self.rows = rows
+        self.key = key
+        self.weights = None
+        self.raw = None
+        self.updates = 0
+        self.memo = OrderedDict()
+
+    def _raw_scores(self, weights):
+        changed = [] if self.weights is None else np.flatnonzero(weights != self.weights)
+
+        if self.raw is None or len(changed) > 1 or self.updates >= self.RECOMPUTE_EVERY:
+            matrix = self.engine.matrix if self.rows is None else self.engine.matrix[self.rows]
+            self.raw = matrix @ (weights * self.engine.sign) + weights[self.engine.invert].sum()
+            self.updates = 0
+        elif len(changed) == 1:
+            j = changed[0]
+            self.raw = self.raw + self.engine.contribution(j, weights[j] - self.weights[j], self.rows)
+            self.updates += 1
+
+        self.weights = weights
+        return self.raw
+
+    # (scores, order) for a weight vector: order holds positions into rows,
+    # all of them ranked or only the best k, and scores the matching scores.
+    # Only these ranked results are memoized, so the memo stays small.
+    def rank(self, weights, k=None):
+        weights = np.asarray(weights, dtype=np.float64)
+        memo_key = (tuple(weights.tolist()), k)
+        cached = self.memo.get(memo_key)
+        if cached is not None:
+            self.memo.move_to_end(memo_key)
+            return cached
+
+        raw = self._raw_scores(weights)
+        total = weights.sum()
+        scores = raw / total * 100 if total > 0 else np.zeros_like(raw)
+        order = rank_order(scores) if k is None else top_k(scores, k)
+
+        self.memo[memo_key] = (scores[order], order)
+        if len(self.memo) > self.MEMO_SIZE:
+            self.memo.popitem(last=False)
+        return self.memo[memo_key]
+
+    # Memory held by this scorer's arrays, in bytes; read-only candidate rows
+    # are shared with the catalog index and not counted
+    @property
+    def nbytes(self):
+        arrays = [self.weights, self.raw]
+        if isinstance(self.rows, np.ndarray) and self.rows.flags.writeable:
+            arrays.append(self.rows)
+        arrays += [array for entry in self.memo.values() for array in entry]
+        return sum(array.nbytes for array in arrays if isinstance(array, np.ndarray))
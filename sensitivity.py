@@ -0,0 +1,175 @@
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from catalog import open_attribute_memmap
+from mcdm import DecisionMatrix, score_with_method
+from scoring import ScoringEngine, top_k_batch
+
+DEFAULT_SAMPLES = 20_000
+DEFAULT_SPREAD = 0.1
+TOP_N = 3
+
+# Upper bound on candidates x samples scored at once
+CHUNK_CELLS = 1 << 22
+
+# Worker processes for large analyses (1 = run in the calling process)
+SENSITIVITY_WORKERS = int(os.environ.get("PET_ADVISOR_SENSITIVITY_WORKERS", os.cpu_count() or 1))
+
+
+# Perturbed copies of a weight vector: Gaussian noise around each slider, clipped to [0, 1]
+def sample_weights(weights, count, spread, rng):
+    noise = rng.normal(0.0, spread, (count, len(weights)))
+    return np.clip(np.asarray(weights, dtype=np.float64) + noise, 0.0, 1.0)
+
+
+# Count, for one chunk of samples, how often each candidate ranks first and in the top N
+def _count_chunk(decision, method, weights, rows, count, spread, seed):
+    rng = np.random.default_rng(seed)
+    samples = sample_weights(weights, count, spread, rng)
+    candidates = decision.engine.matrix.shape[0] if rows is None else len(rows)
+
+    first = np.zeros(candidates, dtype=np.int64)
+    top = np.zeros(candidates, dtype=np.int64)
+    step = max(1, CHUNK_CELLS // max(candidates, 1))
+    for start in range(0, count, step):
+        scores = score_with_method(method, decision, samples[start:start + step], rows)
+        best = top_k_batch(scores, TOP_N)
+        first += np.bincount(best[0], minlength=candidates)
+        top += np.bincount(best.ravel(), minlength=candidates)
+    return first, top
+
+
+# Decision matrix over a version's attribute file, kept for the worker's next chunks
+@functools.lru_cache(maxsize=2)
+def _worker_decision(version):
+    return DecisionMatrix(ScoringEngine(open_attribute_memmap(version)))
+
+
+def _count_chunk_in_worker(version, method, weights, rows, count, spread, seed):
+    return _count_chunk(_worker_decision(version), method, weights, rows, count, spread, seed)
+
+
+# One pool per process, reused across analyses. Workers are spawned rather
+# than forked: the server process runs many threads, and a forked child could
+# inherit locks they held.
+@functools.cache
+def _process_pool(workers):
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+# Monte Carlo rank stability: score `samples` perturbed weight vectors as one
+# weight matrix (in memory-bounded chunks) and report, per candidate row, the
+# probability of ranking first and of making the top N. Chunks get independent
+# seeds, so results are the same with or without a process pool. progress,
+# if given, is called with the fraction of samples done after each chunk.
+def rank_stability(catalog, weights, rows=None, method="WSM", samples=DEFAULT_SAMPLES,
+                   spread=DEFAULT_SPREAD, seed=0, workers=SENSITIVITY_WORKERS, progress=None):
+    candidates = len(catalog) if rows is None else len(rows)
+    if candidates == 0 or samples <= 0:
+        return []
+
+    chunk_size = max(1, min(samples, CHUNK_CELLS // candidates))
+    if workers > 1:
+        # Spread the work so every worker gets something to do
+        chunk_size = max(1, min(chunk_size, -(-samples // workers)))
+    counts = [min(chunk_size, samples - start) for start in range(0, samples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+
+    first = np.zeros(candidates, dtype=np.int64)
+    top = np.zeros(candidates, dtype=np.int64)
+    done = 0
+    if workers > 1 and catalog.source is not None and len(counts) > 1:
+        # Workers map the snapshot's attribute file. The catalog (and so its
+        # memory map) stays referenced here until every chunk is back, which
+        # keeps the file from being deleted as superseded in the meantime.
+        pool = _process_pool(workers)
+        try:
+            futures = [
+                pool.submit(
+                    _count_chunk_in_worker, catalog.version, method, weights, rows, count, spread, chunk_seed
+                )
+                for count, chunk_seed in zip(counts, seeds)
+            ]
+            for count, future in zip(counts, futures):
+                chunk_first, chunk_top = future.result()
+                first += chunk_first
+                top += chunk_top
+                done += count
+                if progress is not None:
+                    progress(done / samples)
+        except concurrent.futures.process.BrokenProcessPool:
+            # A worker died; start a fresh pool next time
+            _process_pool.cache_clear()
+            raise
+    else:
+        for count, chunk_seed in zip(counts, seeds):
+            chunk_first, chunk_top = _count_chunk(catalog.decision_matrix, method, weights, rows, count, spread, chunk_seed)
+            first += chunk_first
+            top += chunk_top
+            done += count
+            if progress is not None:
+                progress(done / samples)
+
+    positions = np.flatnonzero(top)
+    positions = positions[np.lexsort((positions, -first[positions], -top[positions]))]
+    catalog_rows = positions if rows is None else np.asarray(rows)[positions]
+    return [
+        {"row": row, "p_first": float(first[position] / samples), "p_top": float(top[position] / samples)}
+        for row, position in zip(catalog_rows.tolist(), positions.tolist())
+    ]
+
+
+# A rank-stability analysis running in a background thread. progress is the
+# fraction of samples done; once done is set, result (or error) is filled in.
+class StabilityJob:
+    def __init__(self, samples):
+        self.samples = samples
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def _run(self, catalog, weights, rows, method, spread):
+        try:
+            self.result = rank_stability(
+                catalog, weights, rows, method, self.samples, spread,
+                progress=lambda fraction: setattr(self, "progress", fraction)
+            )
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+
+# Jobs cached per (catalog version, weights, filter, method, sampling settings)
+_results = OrderedDict()
+_results_lock = threading.Lock()
+CACHE_SIZE = 64
+
+
+# Start (or find) the analysis for these settings. It runs to the end in the
+# background even if the rerun that asked for it is interrupted, so the
+# result is ready when the same settings are shown again; failed jobs are
+# started again on the next call.
+def stability_job(catalog, weights, rows=None, filter_key=None, method="WSM",
+                  samples=DEFAULT_SAMPLES, spread=DEFAULT_SPREAD):
+    key = (catalog.version, tuple(np.asarray(weights, dtype=np.float64).tolist()), filter_key, method, samples, spread)
+    with _results_lock:
+        job = _results.get(key)
+        if job is not None and job.error is None:
+            _results.move_to_end(key)
+            return job
+
+        job = _results[key] = StabilityJob(samples)
+        while len(_results) > CACHE_SIZE:
+            _results.popitem(last=False)
+    threading.Thread(
+        target=job._run, args=(catalog, weights, rows, method, spread), name="rank-stability", daemon=True
+    ).start()
+    return job
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+# Sessions idle longer than this lose their cached results (and are forgotten)
+SESSION_IDLE_SECONDS = float(os.environ.get("PET_ADVISOR_SESSION_IDLE_SECONDS", 15 * 60))
+
+# Upper bound on cached results across all sessions; least recently active
+# sessions lose their caches first when it is exceeded
+SESSION_CACHE_MAX_BYTES = int(os.environ.get("PET_ADVISOR_SESSION_CACHE_BYTES", 256 * 1024 * 1024))
+
+
+class _Session:
+    __slots__ = ("last_seen", "scorer")
+
+    def __init__(self, now):
+        self.last_seen = now
+        self.scorer = None
+
+    @property
+    def nbytes(self):
+        return self.scorer.nbytes if self.scorer is not None else 0
+
+
+# Per-session cached results for every browser session of this process. The
+# catalog itself is shared (catalog.get_catalog); a session only keeps its
+# IncrementalScorer here, so memory can be accounted for and reclaimed from
+# sessions that went idle or closed without telling us.
+class SessionRegistry:
+    def __init__(self, idle_seconds=SESSION_IDLE_SECONDS, max_bytes=SESSION_CACHE_MAX_BYTES):
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # The session's scorer for key, built with factory() when it has none for
+    # that key (first run, filter change or after eviction)
+    def scorer(self, session_id, key, factory):
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(now)
+            session.last_seen = now
+            scorer = session.scorer
+        if scorer is None or scorer.key != key:
+            scorer = factory()
+            with self._lock:
+                session.scorer = scorer
+        return scorer
+
+    def session_bytes(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session.nbytes if session is not None else 0
+
+    # Forget idle sessions, then drop the caches of the least recently active
+    # ones until the total is within max_bytes. Returns the number evicted.
+    def evict(self, now=None):
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        with self._lock:
+            for session_id, session in list(self._sessions.items()):
+                if now - session.last_seen > self.idle_seconds:
+                    del self._sessions[session_id]
+                    evicted += 1
+
+            total = sum(session.nbytes for session in self._sessions.values())
+            for session in sorted(self._sessions.values(), key=lambda s: s.last_seen):
+                if total <= self.max_bytes:
+                    break
+                if session.scorer is not None:
+                    total -= session.nbytes
+                    session.scorer = None
+                    evicted += 1
+
+            self.evictions += evicted
+        return evicted
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            sizes = [session.nbytes for session in self._sessions.values()]
+            idle = [now - session.last_seen for session in self._sessions.values()]
+            return {
+                "sessions": len(sizes),
+                "total_bytes": sum(sizes),
+                "max_bytes": self.max_bytes,
+                "largest_session_bytes": max(sizes, default=0),
+                "longest_idle_s": round(max(idle, default=0.0), 1),
+                "idle_seconds": self.idle_seconds,
+                "evictions": self.evictions,
+            }
+
+
+# Process-wide registry shared by every Streamlit session
+SESSIONS = SessionRegistry()
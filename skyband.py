@@ -0,0 +1,455 @@
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+# Largest k the structure answers; bigger top-k queries score every candidate
+SKYBAND_K = int(os.environ.get("PET_ADVISOR_SKYBAND_K", 50))
+
+# Counts are kept up to this (well above SKYBAND_K, for about 10% more
+# counting), so pets that lose a few dominators on reloads stay out of the band
+COUNT_CAP = 255
+
+# Pet types with more rows than this aren't banded: counting is quadratic in
+# the type's size (about 1 s for 10k rows, 3 s for 20k, 11 s for 40k).
+# Below SKYBAND_MIN_ROWS pets the band prunes too little to beat one contiguous full scoring.
+SKYBAND_MAX_ROWS = int(os.environ.get("PET_ADVISOR_SKYBAND_MAX_ROWS", 20_000))
+SKYBAND_MIN_ROWS = 50_000
+
+# Rows per type whose exact counts estimate how much a band would prune
+# before anything is built
+SAMPLE_ROWS = 500
+
+# Points and earlier survivors compared at once while counting
+BLOCK_ROWS = 256
+CHUNK_ROWS = 4096
+
+# Scoring a band row (gathered from the matrix) costs about this many
+# contiguous rows of a full scan, so the band is only used when it is smaller
+# than 1/BAND_ROW_COST of the candidates
+BAND_ROW_COST = 2
+
+# A reload changing (adding, updating or removing) up to this many rows updates
+# the previous version's counts; more, or more than REBUILD_SHARE of the rows
+# changed since the last full build, counts from scratch
+INCREMENTAL_MAX_ROWS = 2000
+REBUILD_SHARE = 0.05
+
+# Band rows kept per (filter, k)
+BAND_CACHE_SIZE = 16
+
+
+class BuildCancelled(Exception):
+    pass
+
+
+# (len(Q), len(P)) mask of which q dominate which p. q dominates p when it is
+# at least as good on every criterion and either strictly better on all of
+# them or earlier in the catalog: then q ranks ahead of p for any non-negative
+# weights, including score ties (broken by catalog order).
+def _dominates(Q, q_rows, P, p_rows):
+    mask = Q[:, None, 0] >= P[None, :, 0]
+    for j in range(1, Q.shape[1]):
+        mask &= Q[:, None, j] >= P[None, :, j]
+    later = mask & (q_rows[:, None] > p_rows[None, :])
+    if later.any():
+        a, b = np.nonzero(later)
+        weak = ~(Q[a] > P[b]).all(axis=1)
+        mask[a[weak], b[weak]] = False
+    return mask
+
+
+# For each point of P, how many points of Q dominate it. Compared in chunks
+# of about BLOCK_ROWS x CHUNK_ROWS pairs, so a handful of points is checked
+# against many in a few large steps.
+def _dominated_by(Q, q_rows, P, p_rows):
+    counts = np.zeros(len(P), dtype=np.int64)
+    step = max(BLOCK_ROWS, BLOCK_ROWS * CHUNK_ROWS // max(min(len(Q), CHUNK_ROWS), 1))
+    for start in range(0, len(P), step):
+        end = min(start + step, len(P))
+        for chunk in range(0, len(Q), CHUNK_ROWS):
+            counts[start:end] += _dominates(
+                Q[chunk:chunk + CHUNK_ROWS], q_rows[chunk:chunk + CHUNK_ROWS], P[start:end], p_rows[start:end]
+            ).sum(axis=0)
+    return counts
+
+
+# Number of pets dominating each one, capped at cap, for an (n, m) matrix of
+# criteria oriented so that higher is better. Points are processed best sum
+# first (then by coordinates, then row), so every dominator comes before the
+# points it dominates, and each block of points is only compared with earlier
+# survivors (points dominated fewer than cap times) and with itself: a pet
+# dominated cap or more times is also dominated cap times by survivors.
+# Counts below cap are exact for deciding "fewer than k" for any k <= cap.
+# Raises BuildCancelled between blocks once stop (an Event) is set.
+def dominance_counts(values, cap, stop=None):
+    values = np.asarray(values, dtype=np.float64)
+    n, m = values.shape
+    order = np.lexsort((np.arange(n), *(-values[:, j] for j in reversed(range(m))), -values.sum(axis=1)))
+    ordered = np.ascontiguousarray(values[order])
+
+    survivors = np.empty_like(ordered)
+    survivor_rows = np.empty(n, dtype=np.intp)
+    survivor_count = 0
+    counts = np.empty(n, dtype=np.int64)
+
+    for start in range(0, n, BLOCK_ROWS):
+        if stop is not None and stop.is_set():
+            raise BuildCancelled()
+        block = ordered[start:start + BLOCK_ROWS]
+        rows = order[start:start + BLOCK_ROWS]
+
+        # Each point dominates itself in the mask; don't count that
+        dominated = _dominates(block, rows, block, rows).sum(axis=0) - 1
+        alive = np.flatnonzero(dominated < cap)
+        for chunk in range(0, survivor_count, CHUNK_ROWS):
+            if len(alive) == 0:
+                break
+            end = min(chunk + CHUNK_ROWS, survivor_count)
+            dominated[alive] += _dominates(
+                survivors[chunk:end], survivor_rows[chunk:end], block[alive], rows[alive]
+            ).sum(axis=0)
+            alive = alive[dominated[alive] < cap]
+
+        counts[rows] = np.minimum(dominated, cap)
+        keep = np.flatnonzero(dominated < cap)
+        survivors[survivor_count:survivor_count + len(keep)] = block[keep]
+        survivor_rows[survivor_count:survivor_count + len(keep)] = rows[keep]
+        survivor_count += len(keep)
+
+    return counts
+
+
+# What a new snapshot needs from the previous one to update its counts:
+# the previous counts mapped onto the kept rows, and the values, types and
+# old positions of the rows that went away (removed, or replaced by an update)
+class _Change:
+    def __init__(self, previous, engine, source_rows, kept, gone, changed):
+        self.kept = kept
+        self.kept_old_rows = source_rows[kept]
+        self.counts = previous.counts[source_rows[kept]]
+        self.gone_rows = gone
+        self.gone_values = Skyband._values(engine, gone)
+        self.gone_types = previous.row_types[gone]
+        self.drift = previous.drift + changed
+        self.cap = previous.cap
+
+
+# k-skyband of each pet type: per catalog row, a lower bound on how many pets
+# of its type dominate it (capped at COUNT_CAP). A pet dominated by k or more pets
+# can never reach the top k under non-negative weights, so exact top-k
+# queries only need to score rows with a count below k. The catalog-wide top
+# k comes from the union of the per-type bands, since a pet's dominators
+# within its type are among its dominators overall.
+#
+# Counts are built once per catalog version, in the background, and saved
+# next to the attribute file so other processes (and restarts) load them
+# instead of counting again. A reload that changes a few rows updates the
+# previous version's counts: pets that went away lower the counts of the pets
+# they dominated and new or updated pets raise them, so the bounds stay valid
+# (they only loosen, which scores a few extra rows). Queries are answered in
+# full until the band is ready.
+#
+# Counting only starts once a sample shows the band would prune enough for
+# the k being asked for (see candidates); for large k most pets make the band
+# and the counting would buy nothing.
+class Skyband:
+    def __init__(self, catalog, k_max=SKYBAND_K, max_rows=SKYBAND_MAX_ROWS, change=None):
+        self.k_max = k_max
+        self.cap = max(k_max, COUNT_CAP)
+        self.max_rows = max_rows
+        self.size = len(catalog)
+        self.version = catalog.version
+        self.persistent = catalog.source is not None
+        self._catalog = weakref.ref(catalog)
+        self._type_rows = catalog.index.type_rows
+        self._all_rows = catalog.index.all_rows
+        self.row_types = np.empty(self.size, dtype=object)
+        for pet_type, rows in self._type_rows.items():
+            self.row_types[rows] = pet_type
+        self.counts = np.full(self.size, self.cap, dtype=np.uint8 if self.cap < 256 else np.int64)
+        self.ready = set()
+        self.drift = 0
+        self.origin = None
+        self.build_s = None
+        self._bands = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # Smallest k asked for, and sampled counts (see _estimate)
+        self._wanted = None
+        self._sample = None
+        # Changes from the previous snapshot (see retire), applied instead of counting
+        self._change = change if change is not None and change.cap == self.cap else None
+
+    # The snapshot's scoring engine, or None once it has been dropped
+    def engine(self):
+        catalog = self._catalog()
+        return catalog.engine if catalog is not None else None
+
+    # Criteria oriented so that higher is always better
+    @staticmethod
+    def _values(engine, rows):
+        return engine.matrix[rows] * engine.sign
+
+    def _path(self):
+        # catalog imports this module
+        from catalog import CACHE_DIR
+
+        return os.path.join(CACHE_DIR, f"skyband-{self.version}-k{self.k_max}-c{self.cap}-r{self.max_rows}.npy")
+
+    def _eligible(self):
+        return [pet_type for pet_type, rows in self._type_rows.items() if len(rows) <= self.max_rows]
+
+    def _finish(self, origin, started):
+        with self._lock:
+            self.ready.update(self._eligible())
+            self._bands.clear()
+        self.origin = origin
+        self.build_s = time.perf_counter() - started
+
+    def _load(self):
+        try:
+            counts = np.load(self._path())
+        except (OSError, ValueError):
+            return False
+        # The name carries the settings; a file that doesn't match them anyway is ignored
+        if counts.shape != self.counts.shape or counts.dtype != self.counts.dtype:
+            return False
+        self.counts = counts
+        return True
+
+    def _save(self):
+        from catalog import save_array
+
+        try:
+            if not os.path.exists(self._path()):
+                save_array(self._path(), self.counts)
+        except OSError:
+            pass
+
+    # Update the previous version's counts for the rows that changed
+    def _apply_change(self, engine, change):
+        counts = self.counts.astype(np.int64)
+        counts[change.kept] = change.counts
+        changed = np.setdiff1d(np.arange(self.size), change.kept, assume_unique=True)
+        changed_types = self.row_types[changed]
+
+        for pet_type, type_rows in self._type_rows.items():
+            if len(type_rows) > self.max_rows:
+                continue
+            kept_rows = np.intersect1d(type_rows, change.kept, assume_unique=True)
+            kept_values = self._values(engine, kept_rows)
+            kept_positions = np.searchsorted(change.kept, kept_rows)
+
+            # Pets that went away no longer dominate anyone (compared in the old catalog order)
+            gone = change.gone_types == pet_type
+            if gone.any():
+                counts[kept_rows] -= _dominated_by(
+                    change.gone_values[gone], change.gone_rows[gone],
+                    kept_values, change.kept_old_rows[kept_positions]
+                )
+
+            # New and updated pets: counted exactly, and dominating the pets they beat
+            new_rows = changed[changed_types == pet_type]
+            if len(new_rows):
+                new_values = self._values(engine, new_rows)
+                counts[kept_rows] += _dominated_by(new_values, new_rows, kept_values, kept_rows)
+                type_values = self._values(engine, type_rows)
+                # Each pet dominates itself in the mask; don't count that
+                counts[new_rows] = _dominated_by(type_values, type_rows, new_values, new_rows) - 1
+
+        self.counts = np.clip(counts, 0, self.cap).astype(self.counts.dtype)
+        self.drift = change.drift
+
+    def _count(self, engine, background):
+        for pet_type in self._eligible():
+            rows = self._type_rows[pet_type]
+            self.counts[rows] = dominance_counts(self._values(engine, rows), self.cap, self._stop)
+            if background:
+                with self._lock:
+                    self.ready.add(pet_type)
+                    self._bands.clear()
+
+    def _build(self, background):
+        from catalog import track_cache_file
+
+        started = time.perf_counter()
+        engine = self.engine()
+        if engine is None:
+            return
+        change, self._change = self._change, None
+        if self.persistent and self._load():
+            origin = "file"
+        elif change is not None:
+            self._apply_change(engine, change)
+            origin = "incremental"
+        else:
+            self._count(engine, background)
+            origin = "built"
+        del engine
+        if self.persistent:
+            if origin != "file":
+                self._save()
+            # Deleted with the attribute file once the version is superseded
+            track_cache_file(self.counts, self._path(), self.version)
+        self._finish(origin, started)
+
+    # Count every eligible type now, in the calling thread
+    def build(self):
+        self._build(background=False)
+
+    # Exact counts (capped) of up to SAMPLE_ROWS random pets per eligible type,
+    # and how many rows of its type each sampled pet stands for
+    def _sample_counts(self, engine):
+        rng = np.random.default_rng(0)
+        counts, shares = [], []
+        for pet_type in self._eligible():
+            if self._stop.is_set():
+                raise BuildCancelled()
+            rows = self._type_rows[pet_type]
+            sample = rows if len(rows) <= SAMPLE_ROWS else np.sort(rng.choice(rows, SAMPLE_ROWS, replace=False))
+            # Each pet dominates itself in the mask; don't count that
+            dominated = _dominated_by(self._values(engine, rows), rows, self._values(engine, sample), sample) - 1
+            counts.append(np.minimum(dominated, self.cap))
+            shares.append(np.full(len(sample), len(rows) / len(sample)))
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return np.concatenate(counts), np.concatenate(shares)
+
+    # Estimated share of the eligible rows in the band for k, or None before sampling
+    def _estimate(self, k):
+        if self._sample is None:
+            return None
+        counts, shares = self._sample
+        return float(shares[counts < k].sum() / shares.sum()) if len(counts) else 1.0
+
+    # Whether a band for k is expected to be small enough to be used
+    def _prunes(self, k):
+        estimate = self._estimate(k)
+        return estimate is not None and estimate * BAND_ROW_COST < 1
+
+    def _build_in_background(self):
+        try:
+            # Loading saved counts or updating the previous version's is cheap;
+            # counting from scratch waits for a sample to show it pays off
+            if self._change is None and not (self.persistent and os.path.exists(self._path())):
+                if self._sample is None:
+                    engine = self.engine()
+                    if engine is None:
+                        return
+                    self._sample = self._sample_counts(engine)
+                    del engine
+                if not self._prunes(self._wanted):
+                    return
+            self._build(background=True)
+        except BuildCancelled:
+            pass
+
+    # Build in the background for top-k queries with this k (the smallest asked
+    # for so far counts); does nothing once built, or when sampling showed the
+    # band wouldn't prune enough for it
+    def start(self, k=None):
+        with self._lock:
+            if k is not None:
+                self._wanted = k if self._wanted is None else min(self._wanted, k)
+            if (
+                (self._thread is not None and self._thread.is_alive())
+                or self.size < SKYBAND_MIN_ROWS or self._stop.is_set()
+                or len(self.ready) == len(self._eligible()) or self._wanted is None
+                or (self._sample is not None and not self._prunes(self._wanted))
+            ):
+                return
+            self._thread = threading.Thread(target=self._build_in_background, name="skyband", daemon=True)
+            self._thread.start()
+
+    # Retire this band when its catalog is replaced: stop any build still
+    # running, and return what the next snapshot needs to update the counts
+    # instead of counting from scratch (None when too much changed or this
+    # band isn't complete). source_rows[new row] is the pet's previous row, or
+    # -1 for added and updated pets.
+    def retire(self, source_rows):
+        self._stop.set()
+        self._change = None
+        engine = self.engine()
+        with self._lock:
+            complete = len(self.ready) == len(self._eligible())
+        if engine is None or not complete:
+            return None
+
+        kept = np.flatnonzero(source_rows >= 0)
+        gone = np.setdiff1d(np.arange(self.size), source_rows[kept], assume_unique=True)
+        changed = len(source_rows) - len(kept) + len(gone)
+        if changed > INCREMENTAL_MAX_ROWS or self.drift + changed > REBUILD_SHARE * max(len(source_rows), 1):
+            return None
+        # Ties are broken by catalog order, which must not change for kept pets
+        if np.any(np.diff(source_rows[kept]) <= 0):
+            return None
+        return _Change(self, engine, source_rows, kept, gone, changed)
+
+    # Rows (in catalog order) that can make the top k among candidate rows,
+    # or None when the band can't answer: k too large, rows that aren't a whole
+    # type or the whole catalog (e.g. hard constraints), or not built yet
+    def band(self, rows, k):
+        if k is None or k > self.k_max or self.size < SKYBAND_MIN_ROWS:
+            return None
+        self.start(k)
+
+        if rows is None:
+            rows = self._all_rows
+        if rows is self._all_rows:
+            key = (None, k)
+            with self._lock:
+                if len(self.ready) < len(self._type_rows):
+                    return None
+                band = self._bands.get(key)
+            if band is None:
+                band = np.flatnonzero(self.counts < k)
+        else:
+            pet_type = next((name for name, type_rows in self._type_rows.items() if rows is type_rows), None)
+            if pet_type is None:
+                return None
+            key = (pet_type, k)
+            with self._lock:
+                if pet_type not in self.ready:
+                    return None
+                band = self._bands.get(key)
+            if band is None:
+                band = rows[self.counts[rows] < k]
+
+        with self._lock:
+            self._bands[key] = band
+            self._bands.move_to_end(key)
+            while len(self._bands) > BAND_CACHE_SIZE:
+                self._bands.popitem(last=False)
+        return band
+
+    # The band for a top-k query when scoring it beats scanning every candidate, else None
+    def candidates(self, rows, k):
+        band = self.band(rows, k)
+        if band is None:
+            return None
+        candidates = self.size if rows is None else len(rows)
+        return band if len(band) * BAND_ROW_COST < candidates else None
+
+    def stats(self):
+        with self._lock:
+            ready = list(self.ready)
+        banded = np.concatenate([self._type_rows[pet_type] for pet_type in ready]) if ready else self._all_rows[:0]
+        band = int(np.count_nonzero(self.counts[banded] < self.k_max))
+        return {
+            "k_max": self.k_max,
+            "types_ready": len(ready),
+            "types": len(self._type_rows),
+            "rows_banded": len(banded),
+            "band_rows": band,
+            "pruning_ratio": 1 - band / len(banded) if len(banded) else 0.0,
+            "origin": self.origin,
+            "build_s": self.build_s,
+            "rows_changed_since_full_build": self.drift,
+            "k_wanted": self._wanted,
+            "estimated_band_share": self._estimate(self._wanted) if self._wanted is not None else None,
+        }
@@ -0,0 +1,120 @@
+import heapq
+
+import numpy as np
+
+# Distances equal to this many decimals count as ties (broken by row id), so
+# float noise from different summation orders can't reorder equidistant pets
+DISTANCE_DECIMALS = 12
+BOUND_TOLERANCE = 1e-9
+
+
+# KD-tree over catalog attribute vectors for nearest-neighbour queries.
+# Queries take per-axis weights, so one tree built per catalog version serves
+# any weighted Euclidean metric: box lower bounds are computed per axis and
+# simply scaled by the query's weights.
+class KDTree:
+    def __init__(self, points, leaf_size=64):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.leaf_size = leaf_size
+        n, d = self.points.shape
+
+        self.index = np.arange(n)
+        self.start = []
+        self.end = []
+        self.children = []
+        self.lower = []
+        self.upper = []
+
+        if n:
+            self._build()
+        self.lower = np.array(self.lower).reshape(-1, d)
+        self.upper = np.array(self.upper).reshape(-1, d)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _add_node(self, start, end):
+        block = self.points[self.index[start:end]]
+        self.start.append(start)
+        self.end.append(end)
+        self.children.append(None)
+        self.lower.append(block.min(axis=0))
+        self.upper.append(block.max(axis=0))
+        return len(self.start) - 1
+
+    def _build(self):
+        stack = [self._add_node(0, len(self.index))]
+        while stack:
+            node = stack.pop()
+            start, end = self.start[node], self.end[node]
+            if end - start <= self.leaf_size:
+                continue
+
+            # Split the widest axis at its median
+            spread = self.upper[node] - self.lower[node]
+            axis = int(np.argmax(spread))
+            if spread[axis] == 0:
+                continue
+            middle = (start + end) // 2
+            rows = self.index[start:end]
+            order = np.argpartition(self.points[rows, axis], middle - start)
+            self.index[start:end] = rows[order]
+
+            left = self._add_node(start, middle)
+            right = self._add_node(middle, end)
+            self.children[node] = (left, right)
+            stack.extend((left, right))
+
+    # Row ids and squared weighted distances of the k nearest points to target,
+    # nearest first, ties broken by row id. An optional boolean mask restricts
+    # the search to candidate rows.
+    def query(self, target, k, weights=None, mask=None):
+        target = np.asarray(target, dtype=np.float64)
+        weights = np.ones_like(target) if weights is None else np.asarray(weights, dtype=np.float64)
+        if k <= 0 or not len(self.index):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        best_rows = np.empty(0, dtype=np.intp)
+        best_dist = np.empty(0)
+        worst = np.inf
+
+        heap = [(0.0, 0)]
+        while heap:
+            bound, node = heapq.heappop(heap)
+            # Equal bounds are still visited so ties resolve to the lowest row id
+            if bound > worst + BOUND_TOLERANCE:
+                break
+
+            children = self.children[node]
+            if children is not None:
+                for child in children:
+                    gap = np.maximum(self.lower[child] - target, 0) + np.maximum(target - self.upper[child], 0)
+                    child_bound = float(gap * gap @ weights)
+                    if child_bound <= worst + BOUND_TOLERANCE:
+                        heapq.heappush(heap, (child_bound, child))
+                continue
+
+            rows = self.index[self.start[node]:self.end[node]]
+            if mask is not None:
+                rows = rows[mask[rows]]
+                if not len(rows):
+                    continue
+            diff = self.points[rows] - target
+            dist = np.round((diff * diff) @ weights, DISTANCE_DECIMALS)
+
+            rows = np.concatenate([best_rows, rows])
+            dist = np.concatenate([best_dist, dist])
+            keep = np.lexsort((rows, dist))[:k]
+            best_rows, best_dist = rows[keep], dist[keep]
+            if len(best_rows) == k:
+                worst = best_dist[-1]
+
+        return best_rows, best_dist
+
+
+# Exact k nearest rows by brute force; used when a filter leaves few candidates
+def nearest_brute_force(points, rows, target, k, weights):
+    diff = points[rows] - target
+    dist = np.round((diff * diff) @ weights, DISTANCE_DECIMALS)
+    keep = np.lexsort((rows, dist))[:k]
+    return rows[keep], dist[keep]
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep attribute files and other per-version caches out of the working tree
+os.environ.setdefault("PET_ADVISOR_CACHE_DIR", tempfile.mkdtemp(prefix="pet-advisor-tests-"))
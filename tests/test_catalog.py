@@ -0,0 +1,136 @@
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_pets
+from catalog import CatalogError, get_catalog, load_catalog, update_catalog, watch_catalog
+from catalog_index import CatalogIndex
+
+
+_last_modified = [0]
+
+
+# Move the mtime forward explicitly, so coarse timestamps still show each change
+def touch(path):
+    _last_modified[0] = max(time.time_ns(), _last_modified[0] + 1_000_000)
+    os.utime(path, ns=(_last_modified[0], _last_modified[0]))
+
+
+def write_pets(path, pets):
+    with open(path, "w", encoding="utf-8") as f:
+        for pet in pets:
+            f.write(json.dumps(pet) + "\n")
+    touch(path)
+
+
+# Update, remove and add a few pets, keeping the others in order
+def edited(pets, seed):
+    rng = np.random.default_rng(seed)
+    pets = [dict(pet, attributes=dict(pet["attributes"])) for pet in pets]
+    for row in rng.choice(len(pets), 15, replace=False):
+        criterion = rng.choice(list(pets[row]["attributes"]))
+        pets[row]["attributes"][criterion] = round(float(rng.integers(0, 11)) / 10, 1)
+    removed = set(rng.choice(len(pets), 10, replace=False).tolist())
+    pets = [pet for row, pet in enumerate(pets) if row not in removed]
+    next_id = max(pet["id"] for pet in pets) + 1
+    for offset, pet in enumerate(generate_pets(12, seed + 1)):
+        pets.insert(int(rng.integers(0, len(pets) + 1)), dict(pet, id=next_id + offset))
+    return pets
+
+
+def assert_same_index(index, expected):
+    assert index.size == expected.size
+    assert set(index.type_rows) == set(expected.type_rows)
+    for pet_type, rows in expected.type_rows.items():
+        np.testing.assert_array_equal(index.type_rows[pet_type], rows)
+    for criterion in expected.criteria:
+        np.testing.assert_array_equal(index.sorted_rows[criterion], expected.sorted_rows[criterion])
+        np.testing.assert_array_equal(index.sorted_values[criterion], expected.sorted_values[criterion])
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_reload_matches_a_fresh_load(tmp_path, seed):
+    path = str(tmp_path / "pets.jsonl")
+    pets = generate_pets(500, seed)
+    write_pets(path, pets)
+    previous = load_catalog(path)
+    previous.index
+
+    for step in range(3):
+        pets = edited(pets, seed * 10 + step)
+        write_pets(path, pets)
+        catalog, changes = update_catalog(previous, path)
+        fresh = load_catalog(path)
+
+        assert "index" in catalog.__dict__, "the previous index should have been patched"
+        assert catalog.pets == fresh.pets
+        np.testing.assert_array_equal(catalog.attributes, fresh.attributes)
+        assert_same_index(catalog.index, CatalogIndex.from_catalog(fresh))
+        assert changes["rows_added"] == 12 and changes["rows_removed"] == 10
+        previous = catalog
+
+
+def test_reload_reuses_unchanged_pets(tmp_path):
+    path = str(tmp_path / "pets.jsonl")
+    pets = generate_pets(50)
+    write_pets(path, pets)
+    previous = load_catalog(path)
+
+    pets[3] = dict(pets[3], name="Renamed")
+    write_pets(path, pets)
+    catalog, changes = update_catalog(previous, path)
+
+    assert changes == {"rows_added": 0, "rows_updated": 1, "rows_removed": 0}
+    assert catalog.pets[0] is previous.pets[0]
+    assert catalog.pets[3] is not previous.pets[3] and catalog.pets[3]["name"] == "Renamed"
+    assert catalog.revision(3) == catalog.version and catalog.revision(0) == previous.version
+
+
+def test_invalid_utf8_is_a_catalog_error(tmp_path):
+    for name in ("pets.jsonl", "pets.csv"):
+        path = tmp_path / name
+        path.write_bytes(b'{"id": 1, "name": "\xff\xfe"}\n')
+        with pytest.raises(CatalogError, match="(?i)utf-8"):
+            load_catalog(str(path))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_watcher_survives_a_bad_write(tmp_path):
+    path = str(tmp_path / "pets.jsonl")
+    write_pets(path, generate_pets(10))
+    assert len(get_catalog(path)) == 10
+    stop = watch_catalog(path, interval=0.02)
+    try:
+        with open(path, "wb") as f:
+            f.write(b'{"id": 1, "name": "\xff\xfe"}\n')
+        touch(path)
+        time.sleep(0.2)
+        assert len(get_catalog(path)) == 10
+
+        write_pets(path, generate_pets(5, seed=1))
+        assert wait_for(lambda: len(get_catalog(path)) == 5)
+    finally:
+        stop.set()
+
+
+def test_get_catalog_checks_the_file_once_the_watcher_stops(tmp_path):
+    path = str(tmp_path / "pets.jsonl")
+    write_pets(path, generate_pets(10))
+    get_catalog(path)
+    stop = watch_catalog(path, interval=0.02)
+    stop.set()
+    time.sleep(0.1)
+
+    write_pets(path, generate_pets(5, seed=1))
+    assert len(get_catalog(path)) == 5
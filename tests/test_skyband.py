@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+import skyband
+from benchmarks.synthetic import generate_pets, synthetic_catalog
+from catalog import load_catalog, update_catalog
+from scoring import top_k
+from skyband import Skyband, dominance_counts
+from test_catalog import edited, write_pets
+
+K_VALUES = [1, 3, 10]
+
+
+@pytest.fixture(autouse=True)
+def small_catalogs(monkeypatch):
+    # Let the band answer for catalogs small enough to test
+    monkeypatch.setattr(skyband, "SKYBAND_MIN_ROWS", 0)
+
+
+@pytest.fixture
+def any_pruning(monkeypatch):
+    # Small catalogs prune too little for the band to beat a scan; use it whenever it's smaller
+    monkeypatch.setattr(skyband, "BAND_ROW_COST", 1)
+
+
+def brute_force_counts(values, rows, cap):
+    counts = np.empty(len(values), dtype=np.int64)
+    for i in range(len(values)):
+        at_least = (values >= values[i]).all(axis=1)
+        strictly = (values > values[i]).all(axis=1)
+        dominators = at_least & (strictly | (rows < rows[i]))
+        dominators[i] = False
+        counts[i] = min(dominators.sum(), cap)
+    return counts
+
+
+def filters(catalog):
+    return [catalog.index.all_rows, *catalog.index.type_rows.values()]
+
+
+# Top k of a full scan against the top k of the band, whenever the band is used
+def assert_candidates_match_a_full_scan(catalog, seed):
+    rng = np.random.default_rng(seed)
+    used = 0
+    for _ in range(20):
+        weights = rng.random(catalog.engine.matrix.shape[1]) * (rng.random(catalog.engine.matrix.shape[1]) > 0.3)
+        if not weights.any():
+            continue
+        for k in K_VALUES:
+            for rows in filters(catalog):
+                band = catalog.skyband.candidates(rows, k)
+                if band is None:
+                    continue
+                used += 1
+                expected = rows[top_k(catalog.engine.score(weights, rows=rows), k)]
+                found = band[top_k(catalog.engine.score(weights, rows=band), k)]
+                np.testing.assert_array_equal(found, expected)
+    assert used, "the band was never small enough to be used"
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_dominance_counts_match_brute_force(seed):
+    values = np.random.default_rng(seed).integers(0, 6, (600, 4)) / 5
+    rows = np.arange(len(values))
+    for cap in (1, 5, 50):
+        np.testing.assert_array_equal(dominance_counts(values, cap), brute_force_counts(values, rows, cap))
+
+
+def test_candidates_match_a_full_scan(any_pruning):
+    catalog = synthetic_catalog(3000, seed=4)
+    catalog.skyband.build()
+    assert_candidates_match_a_full_scan(catalog, 0)
+
+
+def test_candidates_after_incremental_reloads_match_a_full_scan(tmp_path, any_pruning):
+    path = str(tmp_path / "pets.jsonl")
+    pets = generate_pets(3000, seed=5)
+    write_pets(path, pets)
+    catalog = load_catalog(path)
+    catalog.skyband.build()
+
+    for step in range(3):
+        pets = edited(pets, 100 + step)
+        write_pets(path, pets)
+        catalog, _ = update_catalog(catalog, path)
+        catalog.skyband.build()
+        assert catalog.skyband.origin == "incremental"
+        assert_candidates_match_a_full_scan(catalog, step)
+
+        # Updated counts stay lower bounds of the exact ones
+        fresh = Skyband(catalog)
+        fresh._count(catalog.engine, background=False)
+        assert (catalog.skyband.counts <= fresh.counts).all()
+
+
+def test_saved_counts_are_only_loaded_with_matching_settings(tmp_path):
+    path = str(tmp_path / "pets.jsonl")
+    write_pets(path, generate_pets(3000, seed=6))
+    catalog = load_catalog(path)
+    catalog.skyband.build()
+    assert catalog.skyband.origin == "built"
+
+    same = Skyband(catalog)
+    same.build()
+    assert same.origin == "file"
+    np.testing.assert_array_equal(same.counts, catalog.skyband.counts)
+
+    # Types over 200 rows aren't counted with these settings, so the file doesn't apply
+    other = Skyband(catalog, max_rows=200)
+    other.build()
+    assert other.origin == "built" and not other.ready
+
+
+def test_band_is_only_a_candidate_when_it_beats_a_scan():
+    catalog = synthetic_catalog(3000, seed=4)
+    catalog.skyband.build()
+    for k in K_VALUES:
+        for rows in filters(catalog):
+            band = catalog.skyband.band(rows, k)
+            expected = band if len(band) * skyband.BAND_ROW_COST < len(rows) else None
+            assert catalog.skyband.candidates(rows, k) is expected
+
+
+def test_large_k_doesnt_start_a_build():
+    catalog = synthetic_catalog(3000, seed=7)
+    band = catalog.skyband
+    assert band.band(None, 50) is None
+    band._thread.join()
+    assert not band.ready and band._estimate(50) * skyband.BAND_ROW_COST >= 1
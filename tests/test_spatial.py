@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from spatial import KDTree, nearest_brute_force
+
+
+# Points on the catalog's 0.1 grid, so many pets are equally far from a target
+def grid_points(n, d, seed):
+    return np.random.default_rng(seed).integers(0, 11, (n, d)) / 10
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("k", [1, 5, 50])
+def test_query_matches_brute_force(seed, k):
+    rng = np.random.default_rng(seed)
+    points = grid_points(3000, 9, seed)
+    tree = KDTree(points, leaf_size=16)
+    rows = np.arange(len(points))
+    for _ in range(10):
+        target = rng.integers(0, 11, 9) / 10
+        weights = rng.random(9) * (rng.random(9) > 0.2)
+        found, distances = tree.query(target, k, weights)
+        expected, expected_distances = nearest_brute_force(points, rows, target, k, weights)
+        np.testing.assert_array_equal(found, expected)
+        np.testing.assert_array_equal(distances, expected_distances)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_masked_query_matches_brute_force_over_the_candidates(seed):
+    rng = np.random.default_rng(seed)
+    points = grid_points(2000, 9, seed)
+    tree = KDTree(points, leaf_size=16)
+    mask = rng.random(len(points)) < 0.3
+    target = rng.integers(0, 11, 9) / 10
+    weights = rng.random(9)
+
+    found, distances = tree.query(target, 20, weights, mask=mask)
+    expected, expected_distances = nearest_brute_force(points, np.flatnonzero(mask), target, 20, weights)
+    np.testing.assert_array_equal(found, expected)
+    np.testing.assert_array_equal(distances, expected_distances)
+
+
+def test_query_handles_k_beyond_the_points_and_an_empty_tree():
+    points = grid_points(10, 3, 0)
+    found, _ = KDTree(points).query(np.zeros(3), 50)
+    np.testing.assert_array_equal(np.sort(found), np.arange(10))
+
+    found, distances = KDTree(np.empty((0, 3))).query(np.zeros(3), 5)
+    assert len(found) == 0 and len(distances) == 0